@@ -0,0 +1,76 @@
+# This file is a derivation of work on - and as such shares the same
+# licence as - Linux Show Player
+#
+# Linux Show Player:
+#   Copyright 2012-2022 Francesco Ceruti <ceppofrancy@gmail.com>
+#
+# This file:
+#   Copyright 2022 s0600204
+#
+# Linux Show Player is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Linux Show Player is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Measures the cost of finding the QLab colour of every cue within a cue list.
+
+"before" reproduces the mapping as it was prior to caching: a regex over each cue's stylesheet,
+then a search of the k-d tree for the nearest palette colour. "after" uses
+`qlab_colour_from_stylesheet`, whose results are cached by stylesheet. (The first pass over the
+cues fills the cache; as a show would, the cue list is then mapped again and again.)
+
+Run with: python benchmarks/bench_colour.py
+"""
+
+import random
+import re
+import timeit
+
+from _plugin import register_plugin_package
+register_plugin_package()
+
+from qlab_mimic.colour import find_nearest_colour, qlab_colour_from_stylesheet
+
+CUES = 5000
+DISTINCT_COLOURS = 8
+REPEATS = 20
+
+
+def before(stylesheet):
+    colour = re.search(r'background:#([0-9A-Fa-f]{6});', stylesheet)
+    if not colour:
+        return 'none'
+    colour = colour.group(1)
+    return find_nearest_colour((
+        int(colour[0:2], 16),
+        int(colour[2:4], 16),
+        int(colour[4:6], 16)
+    ))[1]
+
+
+def main():
+    generator = random.Random(53000)
+    colours = ['background:#{:06x};'.format(generator.randrange(0x1000000))
+        for _ in range(DISTINCT_COLOURS)]
+    stylesheets = [generator.choice(colours + ['']) for _ in range(CUES)]
+
+    assert [before(s) for s in stylesheets] == [qlab_colour_from_stylesheet(s) for s in stylesheets]
+
+    for name, mapping in (('before', before), ('after', qlab_colour_from_stylesheet)):
+        elapsed = timeit.timeit(
+            lambda mapping=mapping: [mapping(s) for s in stylesheets], number=REPEATS)
+        print(f'{name}: {elapsed / REPEATS * 1000:.2f} ms per {CUES} cues')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+# This file is a derivation of work on - and as such shares the same
+# licence as - Linux Show Player
+#
+# Linux Show Player:
+#   Copyright 2012-2022 Francesco Ceruti <ceppofrancy@gmail.com>
+#
+# This file:
+#   Copyright 2022 s0600204
+#
+# Linux Show Player is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Linux Show Player is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Measures the latency from a GO being received until its handler starts (and thus calls
+`layout.go()`, starting the cue).
+
+"before" reproduces the handling as it was prior to `CommandScheduler` and
+`MainThreadDispatcher`: the handler was called directly in the thread that received the message.
+"after" submits the message to the scheduler, which hands it to the dispatcher, which queues a
+batch to be run by the main thread's event loop.
+
+LiSP's `Signal` (and Qt's event loop) aren't available outside of LiSP, so a stand-in is used: a
+queued connection posts the call to a queue, which a thread standing in for the main thread
+runs. Each GO is sent whilst the other thread is idle, as it would be once the show is running.
+
+Run with: python benchmarks/bench_go_latency.py
+"""
+
+from queue import Queue
+import sys
+from threading import Event, Thread
+from time import monotonic, sleep
+from types import ModuleType, SimpleNamespace
+
+from _plugin import register_plugin_package
+register_plugin_package()
+
+GOS = 2000
+INTERVAL = 0.001 # seconds between each GO
+
+EVENT_LOOP = Queue()
+
+
+class Connection:
+    Direct = 'direct'
+    QtQueued = 'queued'
+
+
+class Signal:
+    '''Stands in for LiSP's `Signal`, queuing calls on the stand-in event loop.'''
+
+    def __init__(self):
+        self._slots = []
+
+    def connect(self, slot, mode=Connection.Direct):
+        self._slots.append((slot, mode))
+
+    def emit(self, *args):
+        for slot, mode in self._slots:
+            if mode == Connection.QtQueued:
+                EVENT_LOOP.put((slot, args))
+            else:
+                slot(*args)
+
+
+def register_signal_stand_in():
+    for name in ('lisp', 'lisp.core'):
+        sys.modules.setdefault(name, ModuleType(name))
+    module = sys.modules['lisp.core.signal'] = ModuleType('lisp.core.signal')
+    module.Connection = Connection
+    module.Signal = Signal
+
+
+def run_event_loop():
+    while True:
+        slot, args = EVENT_LOOP.get()
+        if slot is None:
+            return
+        slot(*args)
+
+
+def measure(receive):
+    latencies = []
+    done = Event()
+
+    def handle_go(request):
+        latencies.append(monotonic() - request.received_at)
+        done.set()
+
+    src = SimpleNamespace(hostname='10.0.0.1', port=53001)
+    for _ in range(GOS):
+        done.clear()
+        receive(handle_go, SimpleNamespace(
+            src=src, path='/go', message_class=MessageClass.Transport, received_at=monotonic()))
+        done.wait()
+        sleep(INTERVAL)
+
+    latencies.sort()
+    return {
+        'mean': sum(latencies) / len(latencies),
+        'p50': latencies[len(latencies) // 2],
+        'p99': latencies[len(latencies) * 99 // 100],
+        'max': latencies[-1],
+    }
+
+
+def main():
+    event_loop = Thread(target=run_event_loop, daemon=True)
+    event_loop.start()
+
+    scheduler = CommandScheduler(dispatcher=MainThreadDispatcher())
+    scheduler.start()
+
+    def before(handler, request):
+        handler(request)
+
+    def after(handler, request):
+        scheduler.submit(request.message_class, handler, request)
+
+    for name, receive in (('before', before), ('after', after)):
+        stats = measure(receive)
+        print(f'{name}: ' + ', '.join(
+            f'{key} {value * 1e6:.1f} us' for key, value in stats.items()))
+
+    scheduler.stop()
+    EVENT_LOOP.put((None, None))
+    event_loop.join()
+
+
+register_signal_stand_in()
+
+# pylint: disable=wrong-import-position
+from qlab_mimic.main_thread import MainThreadDispatcher
+from qlab_mimic.scheduler import CommandScheduler
+from qlab_mimic.utility import MessageClass
+
+if __name__ == '__main__':
+    main()
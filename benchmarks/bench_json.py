@@ -0,0 +1,103 @@
+# This file is a derivation of work on - and as such shares the same
+# licence as - Linux Show Player
+#
+# Linux Show Player:
+#   Copyright 2012-2022 Francesco Ceruti <ceppofrancy@gmail.com>
+#
+# This file:
+#   Copyright 2022 s0600204
+#
+# Linux Show Player is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Linux Show Player is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Measures the time taken to encode a `/cueLists` reply for a workspace of 5,000 cues.
+
+"before" encodes the entire reply (as a dict, with the cue summaries nested within) in one go, as
+was done prior to the introduction of cached JSON fragments. "after" splices the cue summaries'
+pre-encoded fragments (as cached by `CuesHandler`) into the reply. The time taken to encode the
+fragments from cold is also given.
+
+orjson is used if it's installed; set NO_ORJSON=1 to measure with the standard library only.
+
+Run with: python benchmarks/bench_json.py
+"""
+
+from json import JSONEncoder, loads
+import os
+import time
+
+from _plugin import register_plugin_package
+register_plugin_package()
+
+# pylint: disable=wrong-import-position
+from qlab_mimic import json_writer
+
+CUES = 5000
+RUNS = 50
+
+if os.environ.get('NO_ORJSON'):
+    json_writer.orjson = None
+
+
+def summary(index):
+    return {
+        'uniqueID': f'{index:032x}',
+        'number': str(index + 1),
+        'name': f'Cue {index}',
+        'listName': f'Cue {index}',
+        'type': 'Audio',
+        'colorName': 'none',
+        'flagged': 'false',
+        'armed': 'true',
+    }
+
+
+def main():
+    encoder = JSONEncoder(separators=(',', ':'))
+    summaries = [summary(index) for index in range(CUES)]
+    cuelist = dict(summary(-1), type='Cue List')
+
+    start = time.perf_counter()
+    fragments = [json_writer.encode_json(cue) for cue in summaries]
+    cold = time.perf_counter() - start
+    cuelist_fragment = json_writer.encode_json(cuelist)
+
+    def before():
+        data = dict(cuelist, cues=summaries)
+        return encoder.encode({
+            'address': '/workspace/x/cueLists',
+            'status': 'ok',
+            'workspace_id': 'x',
+            'data': [data],
+        })
+
+    def after():
+        data = json_writer.join_fragments([json_writer.extend_fragment(
+            cuelist_fragment, 'cues', json_writer.join_fragments(fragments))])
+        return json_writer.encode_reply('/workspace/x/cueLists', 'ok', 'x', data)
+
+    assert loads(before()) == loads(after())
+
+    print(f"Encoder: {'orjson' if json_writer.orjson else 'stdlib'}")
+    for name, encode in (('before', before), ('after', after)):
+        start = time.perf_counter()
+        for _ in range(RUNS):
+            encode()
+        print(f'{name}: {(time.perf_counter() - start) / RUNS * 1000:.2f} ms/reply')
+    print(f'fragments (cold): {cold * 1000:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+# This file is a derivation of work on - and as such shares the same
+# licence as - Linux Show Player
+#
+# Linux Show Player:
+#   Copyright 2012-2022 Francesco Ceruti <ceppofrancy@gmail.com>
+#
+# This file:
+#   Copyright 2022 s0600204
+#
+# Linux Show Player is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Linux Show Player is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Measures the cost of dispatching an incoming message to its handler.
+
+"before" reproduces the dispatch as it was prior to the introduction of `OscRouter`: a dict of
+bound methods built for each message (twice, for workspace messages), with the path split afresh
+at each step. "after" routes the message with `OscRouter`, including parsing it into a request.
+
+Run with: python benchmarks/bench_router.py
+"""
+
+import timeit
+
+from _plugin import register_plugin_package
+register_plugin_package()
+
+# pylint: disable=wrong-import-position
+from qlab_mimic.router import OscRouter
+from qlab_mimic.utility import join_path, split_path
+
+MESSAGES = 200000
+PATH = '/workspace/1234-5678/cue_id/abcdef-0123/valuesForKeys'
+WORKSPACE_ID = '1234-5678'
+WORKSPACE_ROUTES = (
+    'connect', 'cueLists', 'disconnect', 'doubleGoWindowRemaining', 'go', 'panic', 'pause',
+    'resume', 'runningCues', 'runningOrPausedCues', 'selectionIsPlayhead', 'showMode', 'stop',
+    'thump', 'updates',
+)
+
+
+class BeforeRouter:
+
+    def handler(self, *_):
+        pass
+
+    def dispatch(self, path):
+        segments = split_path(path)
+        handlers = {
+            'cue': self.handler,
+            'cue_id': self.handler,
+            'disconnect': self.handler,
+            'go': self.handler,
+            'stop': self.handler,
+            'updates': self.handler,
+            'version': self.handler,
+            'workspace': self.dispatch_workspace,
+        }
+        handlers.get(segments[0])(path)
+
+    def dispatch_workspace(self, path):
+        segments = split_path(path)
+        if segments[1] != WORKSPACE_ID:
+            return
+        handlers = {route: self.handler for route in WORKSPACE_ROUTES}
+        handlers.update({
+            'cue': self.dispatch_cue,
+            'cue_id': self.dispatch_cue,
+            'select': self.handler,
+            'select_id': self.handler,
+        })
+        handlers.get(segments[2])(path)
+
+    def dispatch_cue(self, path):
+        segments = split_path(path)
+        del segments[0:2]
+        self.handler(join_path(segments))
+
+
+def build_router():
+    def handler(_):
+        pass
+
+    router = OscRouter()
+    for route in WORKSPACE_ROUTES:
+        router.add('/workspace/{workspace_id}/' + route, handler)
+    router.add('/workspace/{workspace_id}/cue/{cue_number}/{property_path+}', handler)
+    router.add('/workspace/{workspace_id}/cue_id/{cue_id}/{property_path+}', handler)
+    return router
+
+
+def main():
+    before = BeforeRouter()
+    router = build_router()
+
+    def after(path):
+        handler, request = router.route(path, [], '', None)
+        handler(request.local_path)
+
+    for name, dispatch in (('before', before.dispatch), ('after', after)):
+        elapsed = timeit.timeit(lambda dispatch=dispatch: dispatch(PATH), number=MESSAGES)
+        print(f'{name}: {elapsed / MESSAGES * 1e6:.2f} us/message')
+
+
+if __name__ == '__main__':
+    main()
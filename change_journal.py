@@ -0,0 +1,137 @@
+# This file is a derivation of work on - and as such shares the same
+# licence as - Linux Show Player
+#
+# Linux Show Player:
+#   Copyright 2012-2022 Francesco Ceruti <ceppofrancy@gmail.com>
+#
+# This file:
+#   Copyright 2022 s0600204
+#
+# Linux Show Player is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Linux Show Player is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Adding, removing, or moving a cue changes the contents of the cue list (or cart page) containing
+it. Rather than telling remote apps to reload the entire workspace each time, such changes are
+recorded in a journal. When the journal is next flushed, only the cue lists that were changed are
+announced as updated; a run of changes (such as dragging many cues at once) thus results in a
+single notification per cue list.
+
+Should more changes be made between flushes than the journal can hold, it is considered to have
+overflowed, and a reload of the entire workspace is requested instead.
+
+The journal also retains recent changes after flushing, so that a client can be told which cue
+lists have changed since the generation it last saw (see `CuesHandler.get_cuelists_since`).
+"""
+
+from collections import deque
+import logging
+from threading import Lock, Timer
+
+logger = logging.getLogger(__name__) # pylint: disable=invalid-name
+
+JOURNAL_LIMIT = 256 # entries
+
+# Kinds of change
+CUE_ADDED = 'added'
+CUE_MOVED = 'moved'
+CUE_REMOVED = 'removed'
+
+
+class ChangeJournal:
+    '''Records the structural changes made to cue lists.
+
+    Each entry is a tuple of the generation, kind of change, cue id, and the id of the cue list
+    affected (or `None` if it was a cue list itself that was added or removed).
+    '''
+
+    def __init__(self, flush, limit=JOURNAL_LIMIT, window=0):
+        self._flush = flush
+        self._limit = limit
+        self._window = window # seconds
+        self._lock = Lock()
+        self._timer = None
+
+        self._entries = deque(maxlen=limit)
+        self._dropped = 0 # The generation of the latest entry no longer retained
+
+        # Cue lists changed since last flushed, and the number of changes made to them
+        self._pending = {}
+        self._pending_count = 0
+
+    @property
+    def window(self):
+        return self._window
+
+    @window.setter
+    def window(self, window):
+        self._window = max(window, 0)
+        if not self._window:
+            self.flush()
+
+    def record(self, generation, kind, cue_id, cuelist_id):
+        with self._lock:
+            if len(self._entries) == self._limit:
+                self._dropped = self._entries[0][0]
+            self._entries.append((generation, kind, cue_id, cuelist_id))
+            self._pending[cuelist_id] = None
+            self._pending_count += 1
+
+            if self._window and self._timer is None:
+                self._timer = Timer(self._window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if not self._window:
+            self.flush()
+
+    @property
+    def horizon(self):
+        '''The generation of the latest change no longer retained (or 0 if none have been dropped).'''
+        return self._dropped
+
+    def retains(self, generation):
+        '''Returns whether all changes made after the given generation are still retained.'''
+        return generation >= self._dropped
+
+    def since(self, generation):
+        with self._lock:
+            return [entry for entry in self._entries if entry[0] > generation]
+
+    def flush(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            pending = list(self._pending)
+            overflowed = self._pending_count > self._limit
+            self._pending = {}
+            self._pending_count = 0
+
+        if not pending:
+            return
+        try:
+            self._flush(pending, overflowed)
+        except Exception: # pylint: disable=broad-except
+            logger.exception('Unable to send notification of changes to cue lists.')
+
+    def clear(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._entries.clear()
+            self._dropped = 0
+            self._pending = {}
+            self._pending_count = 0
@@ -0,0 +1,210 @@
+# This file is a derivation of work on - and as such shares the same
+# licence as - Linux Show Player
+#
+# Linux Show Player:
+#   Copyright 2012-2022 Francesco Ceruti <ceppofrancy@gmail.com>
+#
+# This file:
+#   Copyright 2022 s0600204
+#
+# Linux Show Player is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Linux Show Player is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Remote apps - particularly those on tablets - rarely disconnect cleanly: when a device sleeps or
+leaves the network, its connection simply goes quiet. Sending to such a client seldom fails
+outright (messages are queued, or buffered by the OS), so without some other means of noticing,
+every update would continue to be sent to it for as long as the plugin runs.
+
+Thus each client's record notes when a message was last received from it. Remote apps send
+`/thump` (or other requests) regularly whilst they are active, so those clients not heard from
+within a timeout are presumed gone and are reaped.
+"""
+
+import logging
+from threading import Event, Lock, Thread
+from time import monotonic
+
+from .utility import client_id_string
+
+logger = logging.getLogger(__name__) # pylint: disable=invalid-name
+
+REAPER_MIN_INTERVAL = 1 # seconds
+
+
+class ClientRecord:
+    '''A connected client, its subscriptions, and what has been sent to it.'''
+
+    __slots__ = (
+        'address',
+        'updates', # subscribed to updates about the workspace and its cues
+        'always_reply', # to be replied to, even when a reply contains no data
+        'elapsed', # subscribed to samples of the elapsed times of running cues
+        'last_seen',
+        'messages_sent',
+        'bytes_sent',
+        'queue_depth', # messages waiting to be sent, as of the last time it was sampled
+        'buckets', # message class -> token bucket, limiting the rate the client may send them
+        'throttled', # messages refused, having been sent too fast
+    )
+
+    def __init__(self, address, now):
+        self.address = address
+        self.updates = False
+        self.always_reply = False
+        self.elapsed = False
+        self.last_seen = now
+        self.messages_sent = 0
+        self.bytes_sent = 0
+        self.queue_depth = 0
+        self.buckets = {}
+        self.throttled = 0
+
+    @property
+    def stats(self):
+        return {
+            'idle': round(monotonic() - self.last_seen, 1),
+            'messages_sent': self.messages_sent,
+            'bytes_sent': self.bytes_sent,
+            'queue_depth': self.queue_depth,
+            'throttled': self.throttled,
+        }
+
+
+class ClientRegistry:
+    '''The clients that have connected to the workspace.
+
+    `queue_depth` is called (with a client's address) to sample the number of messages waiting to
+    be sent to it, and `reaping` (with a list of records) before idle clients are removed, so that
+    they may be told.
+    '''
+
+    def __init__(self, queue_depth, reaping=None):
+        self._queue_depth = queue_depth
+        self._on_reaping = reaping
+        self._lock = Lock()
+        self._clients = {} # client id -> record
+        self._idle_timeout = 0
+        self._stopping = Event()
+        self._thread = None
+
+        self.reaped = 0
+
+    def __len__(self):
+        return len(self._clients)
+
+    def __contains__(self, address):
+        return client_id_string(address) in self._clients
+
+    @property
+    def stats(self):
+        with self._lock:
+            clients = {client_id: record.stats for client_id, record in self._clients.items()}
+        return {
+            'clients': clients,
+            'reaped': self.reaped,
+        }
+
+    def get(self, address):
+        return self._clients.get(client_id_string(address))
+
+    def connect(self, address):
+        '''Returns the record of a client, adding one if it's not yet been seen.'''
+        client_id = client_id_string(address)
+        with self._lock:
+            record = self._clients.get(client_id)
+            if record is None:
+                record = self._clients[client_id] = ClientRecord(address, monotonic())
+            return record
+
+    def remove(self, address):
+        with self._lock:
+            return self._clients.pop(client_id_string(address), None)
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+
+    def seen(self, address):
+        '''Notes that a message has been received from a client.'''
+        record = self._clients.get(client_id_string(address))
+        if record is not None:
+            record.last_seen = monotonic()
+
+    def subscribers(self, subscription=None):
+        '''Returns the records of those clients with a subscription (or of all clients, if `None`).'''
+        with self._lock:
+            if subscription is None:
+                return list(self._clients.values())
+            return [record for record in self._clients.values() if getattr(record, subscription)]
+
+    @staticmethod
+    def sent(records, size):
+        '''Notes that a message of `size` bytes has been sent to each of several clients.'''
+        for record in records:
+            record.messages_sent += 1
+            record.bytes_sent += size
+
+    def set_idle_timeout(self, timeout):
+        '''Starts reaping clients not heard from in `timeout` seconds. `0` disables reaping.'''
+        self.stop()
+        self._idle_timeout = timeout
+        if timeout <= 0:
+            return
+
+        self._stopping.clear()
+        self._thread = Thread(target=self._run, name='QlabMimicClientReaper', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+
+    def reap(self):
+        '''Removes (and returns the records of) those clients that have been idle too long.'''
+        now = monotonic()
+        expiry = now - self._idle_timeout
+        with self._lock:
+            idle = []
+            for record in self._clients.values():
+                record.queue_depth = self._queue_depth(record.address)
+                if record.last_seen < expiry:
+                    idle.append(record)
+        if not idle:
+            return idle
+
+        # (Called without the lock held, as telling a client may find it gone, and remove it)
+        if self._on_reaping is not None:
+            self._on_reaping(idle)
+
+        reaped = []
+        with self._lock:
+            for record in idle:
+                client_id = client_id_string(record.address)
+                # Unless it's since been heard from (or removed)
+                if self._clients.get(client_id) is record and record.last_seen < expiry:
+                    reaped.append(self._clients.pop(client_id))
+        self.reaped += len(reaped)
+        return reaped
+
+    def _run(self):
+        interval = max(self._idle_timeout / 4, REAPER_MIN_INTERVAL)
+        while not self._stopping.wait(interval):
+            try:
+                self.reap()
+            except Exception: # pylint: disable=broad-except
+                logger.exception('Unable to reap idle clients.')
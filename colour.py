@@ -41,6 +41,11 @@ Links:
 * https://qlab.app/docs/v4/scripting/osc-dictionary-v4/#cuecue_numbercolorname-string
 """
 
+from functools import lru_cache
+import re
+
+STYLESHEET_COLOUR_REGEX = re.compile(r'background:#([0-9A-Fa-f]{6});')
+
 # The colours QLab uses.
 #
 # Names were initially discovered by comparing against the list of colours compiled by Randall
@@ -238,3 +243,19 @@ def find_nearest_colour(colour, tree=None, nearest=None, depth=0):
                 nearest = find_nearest_colour(colour, left_branch, nearest, depth)
 
     return nearest
+
+@lru_cache(maxsize=256)
+def qlab_colour_from_stylesheet(stylesheet):
+    """Returns the name of the palette colour nearest to the background colour of a cue.
+
+    Shows tend to use only a handful of distinct colours, so the results are cached.
+    """
+    colour = STYLESHEET_COLOUR_REGEX.search(stylesheet)
+    if not colour:
+        return 'none'
+    colour = colour.group(1)
+    return find_nearest_colour((
+        int(colour[0:2], 16),
+        int(colour[2:4], 16),
+        int(colour[4:6], 16)
+    ))[1]
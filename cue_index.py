@@ -0,0 +1,256 @@
+# This file is a derivation of work on - and as such shares the same
+# licence as - Linux Show Player
+#
+# Linux Show Player:
+#   Copyright 2012-2022 Francesco Ceruti <ceppofrancy@gmail.com>
+#
+# This file:
+#   Copyright 2022 s0600204
+#
+# Linux Show Player is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Linux Show Player is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Indexes of the cues within a session, allowing cues to be looked up by id, number, or position,
+(or matched against an OSC address pattern of their cue number or id) without scanning every cue.
+
+The indexes are kept up-to-date from the signals emitted by the cue model (in the main thread),
+whilst being read from other threads. So they're copy-on-write: the current indexes are held in an
+`IndexState` that is never modified once published. Changes are made to a copy, taken at the first
+change since the last was published, and published together (see `publish`), so that a burst of
+changes costs only the one copy. Readers take the current state once, and use only that.
+
+Cue numbers are compared as strings, as that is how they are presented to (and matched by) remote
+apps. Keeping them sorted as strings means all numbers beginning with a given prefix are adjacent,
+so the candidates for a pattern can be found by binary search.
+
+In List Layout a cue's number is its position within the list, so the set of numbers is always
+`1..n` and only changes when the number of cues does. In Cart Layout, cues keep their number
+(position within the pages of the cart) until they are moved, so numbers are tracked per cue,
+along with the page, row, and column that each cue is positioned at.
+"""
+
+from bisect import bisect_left, insort
+
+from lisp.plugins.list_layout.layout import ListLayout
+
+from .utility import compile_osc_pattern, osc_pattern_prefixes
+
+
+class IndexState:
+    '''The indexes of the cues within a session, at a moment in time.'''
+
+    __slots__ = (
+        'by_id', 'ids', 'numbers', 'index_by_id',
+        # List Layout only
+        'order',
+        # Cart Layout only
+        'by_index', 'position_by_id', 'pages',
+    )
+
+    def __init__(self):
+        self.by_id = {}
+        self.ids = []
+        self.numbers = []
+        self.index_by_id = {}
+        self.order = ()
+        self.by_index = {}
+        self.position_by_id = {}
+        self.pages = {}
+
+    def copy(self):
+        state = IndexState()
+        state.by_id = dict(self.by_id)
+        state.ids = list(self.ids)
+        state.numbers = list(self.numbers)
+        state.index_by_id = dict(self.index_by_id)
+        state.order = self.order
+        state.by_index = dict(self.by_index)
+        state.position_by_id = dict(self.position_by_id)
+        state.pages = {page: list(indexes) for page, indexes in self.pages.items()}
+        return state
+
+
+EMPTY_STATE = IndexState()
+
+
+class CueIndex:
+
+    def __init__(self):
+        self._layout = None
+        self._positional = False
+        self._state = EMPTY_STATE
+        # A copy of the state, to which changes are made until they're published (if any have
+        # been made since the last were)
+        self._pending = None
+
+    def build(self, layout):
+        self._layout = layout
+        self._positional = isinstance(layout, ListLayout)
+        self._pending = IndexState()
+        for cue in layout.model:
+            self._add(self._pending, cue)
+        self.publish()
+
+    def clear(self):
+        self._layout = None
+        self._state = EMPTY_STATE
+        self._pending = None
+
+    def cue_added(self, cue):
+        if self._layout is None:
+            return
+        self._add(self._edit(), cue)
+
+    def cue_removed(self, cue):
+        if self._layout is None:
+            return
+        state = self._edit()
+        state.by_id.pop(cue.id, None)
+        self._remove_sorted(state.ids, cue.id)
+        if not self._positional:
+            self._remove_positioned(state, cue)
+
+    def cue_moved(self, cue):
+        if self._layout is None:
+            return
+        state = self._edit()
+        if not self._positional:
+            self._remove_positioned(state, cue)
+            self._add_positioned(state, cue)
+
+    def _edit(self):
+        if self._pending is None:
+            self._pending = self._state.copy()
+        return self._pending
+
+    def _add(self, state, cue):
+        state.by_id[cue.id] = cue
+        insort(state.ids, cue.id)
+        if not self._positional:
+            self._add_positioned(state, cue)
+
+    def publish(self):
+        '''Publishes the changes made since last called, returning whether there were any.'''
+        state = self._pending
+        if state is None:
+            return False
+
+        if self._positional:
+            # In List Layout a cue's number is its position, which adding, removing, or moving any
+            # cue before it changes. The set of numbers changes only with the number of cues.
+            count = len(state.order)
+            state.order = tuple(self._layout.model)
+            state.index_by_id = {cue.id: index for index, cue in enumerate(state.order)}
+            if count != len(state.order):
+                state.numbers = sorted(str(num) for num in range(1, len(state.order) + 1))
+        self._state = state
+        self._pending = None
+        return True
+
+    def _add_positioned(self, state, cue):
+        index = cue.index
+        position = self._layout.to_3d_index(index)
+        state.by_index[index] = cue
+        state.index_by_id[cue.id] = index
+        state.position_by_id[cue.id] = position
+        insort(state.pages.setdefault(position[0], []), index)
+        insort(state.numbers, str(index + 1))
+
+    def _remove_positioned(self, state, cue):
+        index = state.index_by_id.pop(cue.id, None)
+        if index is None:
+            return
+        page = state.position_by_id.pop(cue.id)[0]
+        del state.by_index[index]
+        self._remove_sorted(state.pages[page], index)
+        self._remove_sorted(state.numbers, str(index + 1))
+
+    @staticmethod
+    def _remove_sorted(values, value):
+        pos = bisect_left(values, value)
+        if pos < len(values) and values[pos] == value:
+            del values[pos]
+
+    def by_id(self, cue_id):
+        return self._state.by_id.get(cue_id)
+
+    def by_index(self, index):
+        '''Returns the cue at the given (layout) index.'''
+        state = self._state
+        if not self._positional:
+            return state.by_index.get(index)
+
+        if 0 <= index < len(state.order):
+            return state.order[index]
+        return None
+
+    def by_number(self, number):
+        try:
+            return self.by_index(int(number) - 1)
+        except ValueError:
+            return None
+
+    def number(self, cue):
+        '''Returns the number of a cue, or `None` if it's not (yet) indexed.'''
+        index = self._state.index_by_id.get(cue.id)
+        return str(index + 1) if index is not None else None
+
+    def cues(self):
+        '''Returns the cues of a List Layout, in order.'''
+        return self._state.order
+
+    def page(self, page):
+        '''Returns the cues on a Cart Layout page, in order.'''
+        state = self._state
+        return [state.by_index[index] for index in state.pages.get(page, [])]
+
+    def position(self, cue, pending=False):
+        '''Returns a (page, row, column) tuple of a cue's position within a Cart Layout.
+
+        If `pending`, changes yet to be published are taken into account.
+        '''
+        state = self._pending if pending and self._pending is not None else self._state
+        return state.position_by_id.get(cue.id)
+
+    def numbers(self):
+        '''Returns all cue numbers, sorted as strings.'''
+        return self._state.numbers
+
+    def match_numbers(self, pattern):
+        '''Returns the cues whose numbers match an OSC address pattern, in cue number order.'''
+        state = self._state
+        numbers = sorted(self._match(state.numbers, pattern), key=int)
+        if self._positional:
+            return [state.order[int(number) - 1] for number in numbers]
+        return [state.by_index[int(number) - 1] for number in numbers]
+
+    def match_ids(self, pattern):
+        '''Returns the cues whose ids match an OSC address pattern.'''
+        state = self._state
+        return [state.by_id[cue_id] for cue_id in self._match(state.ids, pattern)]
+
+    @staticmethod
+    def _match(values, pattern):
+        regex = compile_osc_pattern(pattern)
+        matched = {}
+        for prefix in osc_pattern_prefixes(pattern):
+            # Only those values starting with the literal prefix of the pattern need checking
+            for pos in range(bisect_left(values, prefix), len(values)):
+                value = values[pos]
+                if not value.startswith(prefix):
+                    break
+                if regex.fullmatch(value):
+                    matched[value] = None
+        return list(matched)
@@ -21,8 +21,12 @@
 # along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
 
 from ast import literal_eval
+from collections import OrderedDict
+from functools import lru_cache
 import logging
-import re
+from threading import Lock
+
+from PyQt5.QtCore import QTimer
 
 from lisp.cues.cue import CueNextAction, CueState
 from lisp.cues.cue_model import CueModel
@@ -30,9 +34,14 @@ from lisp.plugins.cart_layout.layout import CartLayout
 from lisp.plugins.list_layout.layout import ListLayout
 from lisp.ui.ui_utils import translate
 
-from .colour import find_nearest_colour
+from .change_journal import ChangeJournal, CUE_ADDED, CUE_MOVED, CUE_REMOVED
+from .colour import qlab_colour_from_stylesheet
+from .cue_index import CueIndex
+from .elapsed_ticker import ElapsedTicker
+from .json_writer import join_fragments
 from .pseudocues import CueCart, CueList
-from .utility import QlabStatus
+from .snapshot import CueRecord, EMPTY_SNAPSHOT, new_snapshot, replace_records
+from .utility import MessageClass, QlabStatus
 
 logger = logging.getLogger(__name__) # pylint: disable=invalid-name
 
@@ -86,22 +95,133 @@ CUE_NEXT_ACTION_MAPPING = {
     CueNextAction.TriggerAfterWait: 1,
 }
 
+# Keys that only apply to certain cue types.
+# These are omitted from `valuesForKeys` replies about other types of cue.
+INFO_KEYS_BY_CUE_TYPE = {
+    'cartColumns': ('CueCart',),
+    'cartRows': ('CueCart',),
+    'children': ('CueCart', 'CueList'),
+    'fileTarget': ('GstMediaCue',),
+}
+
+# Requests that cause a cue to start, stop, etc.
+CUE_ACTIONS = frozenset([
+    'go', 'hardPause', 'hardStop', 'panic', 'panicInTime', 'pause', 'resume', 'start',
+    'startAndAutoloadNext', 'stop', 'togglePause',
+])
+
+# Requests with arguments that don't change anything
+CUE_QUERIES_WITH_ARGS = frozenset(['children', 'valuesForKeys'])
+
+# Sent in place of a cue list (or its children) when nothing has changed since the generation
+# given by the client.
+UNCHANGED = 'unchanged'
+
+def parse_string_list(raw):
+    '''Parses a list of strings sent as an argument, such as the keys of a `valuesForKeys` request.
+
+    Remote apps tend to send the same list every time, so the result is cached.
+    '''
+    # Checked before the cache is consulted, as other types of argument (e.g. blobs) may be unhashable
+    if not isinstance(raw, str):
+        return None
+    return _parse_string_list(raw)
+
+@lru_cache(maxsize=256)
+def _parse_string_list(raw):
+    try:
+        values = literal_eval(raw)
+    except (SyntaxError, ValueError, TypeError):
+        # e.g. `{[]: 1}`, which parses, but can't be built
+        return None
+    except (MemoryError, RecursionError):
+        # Pathologically nested input
+        return None
+    if not isinstance(values, (list, tuple)):
+        return None
+    return tuple(str(value) for value in values if isinstance(value, (str, int)))
+
+def cue_message_class(request):
+    '''Returns the `MessageClass` of a request about a cue.'''
+    key = request.property_path[0]
+    if key in CUE_ACTIONS:
+        return MessageClass.Transport
+    if request.args and key not in CUE_QUERIES_WITH_ARGS:
+        return MessageClass.Set
+    return MessageClass.Query
+
 class CuesHandler:
 
     CueTypesAliasingPrompted = []
 
     def __init__(self, plugin):
         self._cuelists = CueModel()
+        self._cuelist_order = []
+        self._index = CueIndex()
         self._plugin = plugin
         self._session_layout = None
 
+        # An immutable snapshot of the fields of each cue seen by remote apps, and of the cues
+        # within each cue list (see `snapshot.py`), maintained once a session has loaded. Writers
+        # replace it (under the lock, so as not to lose each other's changes); readers need only
+        # take the current one.
+        self._snapshot = EMPTY_SNAPSHOT
+        self._snapshot_lock = Lock()
+
+        # Changes are published (to the index, snapshot, and generations) together, once control
+        # returns to the event loop, so that a burst of them (e.g. pasting many cues) costs only
+        # one copy of each. Until then are staged:
+        # * `_staged_cues`: the cues whose records are to be rebuilt, by id.
+        # * `_staged_removed`: the ids of cues removed.
+        # * `_staged_cuelists`: the ids of cue lists that have had cues added, removed, or moved;
+        #   or `None`, should cue lists themselves have been.
+        # * `_staged_changes`: the arguments to `_advance_generation` of each change.
+        self._staged_cues = {}
+        self._staged_removed = {}
+        self._staged_cuelists = set()
+        self._staged_changes = []
+        self._publish_scheduled = False
+
+        # Generation numbers, incremented with each change to a cue's summary, so that remote apps
+        # may ask for only what has changed since they last asked.
+        # * `_cuelist_generations`: the generation of the latest change within each cue list.
+        # * `_changed_at`: a tuple of the generation and cue list id of the latest change to
+        #   each cue, kept in order of generation so that those too old to be asked about may be
+        #   pruned from the front.
+        # * `_journal`: the cues added to, removed from, or moved within each cue list.
+        self._generation = 0
+        self._cuelist_generations = {}
+        self._changed_at = OrderedDict()
+        self._journal = ChangeJournal(self._on_journal_flushed)
+
+        # Clients that last saw a generation before this must reload in full
+        self._baseline = 0
+
+        # Whilst a session is being loaded, cues are indexed once loading has completed, rather
+        # than one at a time as they are added.
+        self._bulk_loading = False
+
+        # Whether the state signals of each cue are connected (see `set_cue_tracking`), and thus
+        # whether the cues that are running may be tracked from them.
+        self._tracking = False
+
+        # Cues that are running or paused, in the order they were started. Kept up-to-date from
+        # the cues' state change signals, so that polls for running cues needn't check every cue.
+        self._active_cues = {}
+        self._ticker = ElapsedTicker(self._running_cues, plugin.emit_elapsed_updated)
+
+        self._info_getters = self._build_info_getters()
+        self._record_getters = self._build_record_getters()
+        self._values_plan = lru_cache(maxsize=128)(self._compile_values_plan)
+
     def register_cuelists(self, session_layout): # session_layout == self.app.layout @ plugin-level
         self._session_layout = session_layout
+        self._index.build(session_layout)
 
         if isinstance(session_layout, ListLayout):
             # LiSP doesn't support multiple cue lists in List Layout
             # Thus, we create a single object encapsulating all cues
-            self._cuelists.add(CueList(session_layout, self._plugin.app))
+            self._add_cuelist(CueList(session_layout, self._index, self._plugin.app))
 
         elif isinstance(session_layout, CartLayout):
             session_layout.page_added.connect(self._on_cartpage_added)
@@ -117,64 +237,435 @@ class CuesHandler:
         for cuelist in self._cuelists:
             cuelist.deinit()
         self._cuelists.reset()
+        self._cuelist_order = []
+        self._index.clear()
+        self._snapshot = EMPTY_SNAPSHOT
+        self._clear_staged()
+        self._active_cues.clear()
+        self._generation = 0
+        self._cuelist_generations.clear()
+        self._changed_at.clear()
+        self._journal.clear()
+        self._baseline = 0
+        self._bulk_loading = False
+        self._tracking = False
+
+    def begin_bulk_load(self):
+        self._bulk_loading = True
+
+    def end_bulk_load(self):
+        self._bulk_loading = False
+        self._index.build(self._session_layout)
+        self._rebuild_snapshot()
+        self._generation += 1
+        self._baseline = self._generation
+        self._prune_changed_at()
+
+    def set_cue_tracking(self, enabled):
+        '''To be called once the state signals of every cue have been connected (or disconnected).
+
+        Until then, the cues that are running are found by checking every cue.
+        '''
+        self._tracking = enabled
+        self._active_cues.clear()
+        if enabled:
+            for cue in self._session_layout.model:
+                self.cue_state_changed(cue)
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def cuelist_generation(self, cuelist):
+        return max(self._cuelist_generations.get(cuelist.id, 0), self._baseline)
+
+    def _advance_generation(self, cue, cuelist, change=None):
+        self._generation += 1
+        cuelist_id = cuelist.id if cuelist is not None else None
+        self._changed_at[cue.id] = (self._generation, cuelist_id)
+        self._changed_at.move_to_end(cue.id)
+        self._cuelist_generations[cuelist_id] = self._generation
+        if change is not None:
+            self._journal.record(self._generation, change, cue.id, cuelist_id)
+            self._prune_changed_at()
+
+    def _prune_changed_at(self):
+        # Clients that last saw a generation at or before this are sent everything afresh, so the
+        # cues changed no later than it needn't be remembered (removed cues would otherwise be
+        # remembered forever).
+        horizon = max(self._journal.horizon, self._baseline)
+        while self._changed_at and next(iter(self._changed_at.values()))[0] <= horizon:
+            self._changed_at.popitem(last=False)
+
+    def _on_journal_flushed(self, cuelist_ids, overflowed):
+        # The journal has already held these changes for a window, so they're sent immediately
+        # rather than held again by the plugin's update coalescer.
+
+        # `None` indicates that cue lists themselves have been added or removed
+        if overflowed or None in cuelist_ids:
+            self._plugin.emit_workspace_updated(coalesce=False)
+            return
+
+        for cuelist_id in cuelist_ids:
+            cuelist = self._cuelists.get(cuelist_id)
+            if cuelist is not None:
+                self._plugin.emit_cue_updated(cuelist, coalesce=False)
+
+    def set_update_window(self, window):
+        self._journal.window = window
+
+    def cue_added(self, cue):
+        if self._bulk_loading:
+            return
+        self._index.cue_added(cue)
+        self._stage(cue, self.cue_parent(cue, pending=True), CUE_ADDED)
+
+    def cue_changed(self, cue):
+        is_cuelist = self._cuelists.get(cue.id) is not None
+        self._stage(cue, cue if is_cuelist else self.cue_parent(cue, pending=True))
+
+    def cue_moved(self, cue):
+        if self._bulk_loading:
+            return
+        old_parent = self.cue_parent(cue, pending=True)
+        self._index.cue_moved(cue)
+        new_parent = self.cue_parent(cue, pending=True)
+        self._stage(cue, old_parent, CUE_MOVED)
+        if new_parent is not old_parent:
+            self._stage(cue, new_parent, CUE_MOVED)
+
+    def cue_removed(self, cue):
+        self._active_cues.pop(cue.id, None)
+        if self._bulk_loading:
+            return
+        parent = self.cue_parent(cue, pending=True)
+        self._index.cue_removed(cue)
+        self._stage(cue, parent, CUE_REMOVED)
+
+    def _stage(self, cue, cuelist, change=None):
+        '''Stages a change to a cue (within a cue list), to be published with any others.'''
+        if change is CUE_REMOVED:
+            self._staged_cues.pop(cue.id, None)
+            self._staged_removed[cue.id] = None
+        else:
+            self._staged_removed.pop(cue.id, None)
+            self._staged_cues[cue.id] = cue
+
+        if change is not None and self._staged_cuelists is not None:
+            if cuelist is None:
+                # (A cue list itself has been added or removed)
+                self._staged_cuelists = None
+            else:
+                self._staged_cuelists.add(cuelist.id)
+
+        self._staged_changes.append((cue, cuelist, change))
+        if not self._publish_scheduled:
+            self._publish_scheduled = True
+            QTimer.singleShot(0, self._publish)
+
+    def _publish(self):
+        self._publish_scheduled = False
+        if self._bulk_loading or not self._staged_changes:
+            # Nothing to publish, or to be replaced once loading has completed
+            return
+
+        self._index.publish()
+        records = [self._build_record(cue) for cue in self._staged_cues.values()]
+        structure = None
+        if self._staged_cuelists is None or self._staged_cuelists:
+            structure = self._build_structure(self._staged_cuelists)
+        with self._snapshot_lock:
+            self._snapshot = replace_records(
+                self._snapshot, records, self._staged_removed, structure)
+
+        # Only once published may clients be told of the changes
+        for cue, cuelist, change in self._staged_changes:
+            self._advance_generation(cue, cuelist, change)
+        self._clear_staged()
+
+    def _clear_staged(self):
+        self._staged_cues = {}
+        self._staged_removed = {}
+        self._staged_cuelists = set()
+        self._staged_changes = []
+
+    def _rebuild_snapshot(self):
+        '''Replaces the snapshot with one built afresh from all cues (and cue lists).'''
+        self._clear_staged()
+        if self._bulk_loading:
+            with self._snapshot_lock:
+                self._snapshot = EMPTY_SNAPSHOT
+            return
+
+        records = [self._build_record(cue) for cue in self._session_layout.model]
+        records.extend(self._build_record(cuelist) for cuelist in self._cuelist_order)
+        structure = self._build_structure()
+        with self._snapshot_lock:
+            self._snapshot = new_snapshot(records, structure)
+
+    def _build_structure(self, cuelist_ids=None):
+        '''Returns the cue list order, the cues within each cue list, and every cue's number.
+
+        If given the ids of some cue lists, only those are rebuilt; the rest are taken from the
+        current snapshot.
+        '''
+        if cuelist_ids is None:
+            children = {}
+            numbers = {}
+        else:
+            children = dict(self._snapshot.children)
+            numbers = dict(self._snapshot.numbers)
+            # Cues may have moved between the cue lists, so all are cleared before any are rebuilt
+            for cuelist_id in cuelist_ids:
+                for cue_id in children.get(cuelist_id, ()):
+                    numbers.pop(cue_id, None)
+
+        for page, cuelist in enumerate(self._cuelist_order):
+            if cuelist_ids is not None and cuelist.id not in cuelist_ids:
+                continue
+            numbers[cuelist.id] = cuelist.index
+            cues = self._index.page(page) if cuelist.type == 'CueCart' else self._index.cues()
+            children[cuelist.id] = tuple(cue.id for cue in cues)
+            for cue in cues:
+                numbers[cue.id] = self._index.number(cue)
+        return (tuple(cuelist.id for cuelist in self._cuelist_order), children, numbers)
+
+    def _build_record(self, cue):
+        return CueRecord(
+            cue.id,
+            cue.name,
+            cue.description,
+            self._derive_qlab_cuetype(cue),
+            self._derive_qlab_colour(cue),
+            cue.duration,
+            cue.pre_wait,
+            cue.post_wait,
+            CUE_NEXT_ACTION_MAPPING.get(cue.next_action, 0),
+            cue.rows if cue.type == 'CueCart' else None,
+            cue.columns if cue.type == 'CueCart' else None,
+        )
+
+    def _record(self, cue):
+        '''Returns the record of a cue, from the current snapshot if possible.'''
+        record = self._snapshot.get(cue.id)
+        return record if record is not None else self._build_record(cue)
+
+    def set_ticker_rate(self, rate):
+        self._ticker.start(rate)
+
+    def terminate(self):
+        self._ticker.stop()
+        self._journal.clear()
+
+    def _running_cues(self):
+        return [cue for cue in self._active_cue_list() if cue.state & CueState.IsRunning]
+
+    def _active_cue_list(self):
+        '''Returns the cues that are running or paused.'''
+        if self._tracking:
+            # State changes may be signalled from other threads, so iterate over a copy
+            return list(self._active_cues.values())
+        if self._session_layout is None:
+            return []
+        return [
+            cue for cue in self._session_layout.model
+            if cue.state & (CueState.IsRunning | CueState.IsPaused)
+        ]
+
+    def _elapsed_times(self, cue):
+        '''Returns a tuple of a cue's elapsed action, pre-wait, and post-wait times (in ms).'''
+        sample = self._ticker.sample(cue)
+        if sample is not None:
+            return sample
+        return (cue.current_time(), cue.prewait_time(), cue.postwait_time())
+
+    def cue_state_changed(self, cue):
+        if cue.state & (CueState.IsRunning | CueState.IsPaused):
+            self._active_cues[cue.id] = cue
+        else:
+            self._active_cues.pop(cue.id, None)
+
+    def _add_cuelist(self, cuelist):
+        self._cuelists.add(cuelist)
+        self._cuelist_order.append(cuelist)
 
     def _on_cartpage_added(self, page_index, _):
-        self._cuelists.add(CueCart(self._session_layout, page_index, self._plugin.app))
-        self._plugin.emit_workspace_updated()
+        page = CueCart(self._session_layout, page_index, self._plugin.app)
+        self._add_cuelist(page)
+        self._stage(page, None, CUE_ADDED)
 
     def _on_cartpage_removed(self, page_index):
-        pages = list(self._cuelists.items())
-        page_removed = pages[page_index][1]
+        page_removed = self._cuelist_order.pop(page_index)
         self._cuelists.remove(page_removed)
 
         # Having removed the page, all subsequent ones have a new (internal) index
-        subsequent_pages = pages[page_index + 1:]
-        for page in subsequent_pages:
-            page[1].set_index(page_index)
-            self._plugin.emit_cue_updated(page[1])
+        for page in self._cuelist_order[page_index:]:
+            page.set_index(page_index)
+            self._plugin.emit_cue_updated(page)
             page_index += 1
 
-        self._plugin.emit_workspace_updated()
+        # As have the cues upon them
+        self._index.build(self._session_layout)
+        self._stage(page_removed, None, CUE_REMOVED)
 
     def _on_cartpage_renamed(self, page_number, label):
         page = self.cuelist(page_number)
+        self.cue_changed(page)
         self._plugin.emit_workspace_updated()
         self._plugin.emit_cue_updated(page)
 
-    def get_cuelists(self):
-        cuelists = []
-        for container in self._cuelists:
-            cuelists.append(self._cue_summary(container))
-        return cuelists
+    def get_cuelists(self, shallow=False):
+        '''Returns the summaries of all cue lists (and the cues within), pre-encoded as JSON.
+
+        If `shallow`, the cues within each cue list are omitted.
+        '''
+        snapshot = self._snapshot
+        return join_fragments(snapshot.summaries_json(snapshot.cuelists, deep=not shallow))
 
-    def by_cue_id(self, path, args, cue_model):
+    def by_cue_id(self, cue_id, path, args):
         # Determine cue based on cue id
-        cue = self._cuelists.get(path[1]) or cue_model.get(path[1])
+        cue = self._cue_by_id(cue_id)
         if cue is None:
             return (QlabStatus.NotOk, None)
-        del path[0:2]
         return self._cue_common(cue, path, args)
 
-    def by_cue_number(self, path, args, cue_layout):
+    def by_cue_number(self, cue_number, path, args):
         # Determine cue based on cue number
-        cue = None
-        if path[1] == 'L': # ListLayout CueList
-            cue = self.cuelist(0)
-        elif path[1].startswith('P'): # CartLayout Page
-            cue = self.cuelist(int(path[1][1:]) - 1)
-        else:
-            if path[1] == 'selected':
+        cue = self._cue_by_number(cue_number)
+        if cue is None:
+            return (QlabStatus.NotOk, None)
+        return self._cue_common(cue, path, args)
+
+    def get_cuelists_since(self, generation):
+        '''Returns what has changed within the workspace since the given generation.
+
+        If nothing has, `UNCHANGED` is returned. Otherwise, a dict listing the ids of cues whose
+        summaries have `changed` or that have been `removed`, along with the ids of the cue lists
+        that have been `restructured` (had cues added, removed, or moved), is returned.
+
+        Should cue lists themselves have been added or removed, or the changes since the
+        generation be no longer retained, all cue lists are returned, as with `get_cuelists`.
+        '''
+        try:
+            generation = int(generation)
+        except (TypeError, ValueError):
+            return (QlabStatus.NotOk, None)
+
+        if not self._baseline <= generation <= self._generation \
+            or not self._journal.retains(generation):
+            return (QlabStatus.Ok, self.get_cuelists())
+
+        if generation == self._generation:
+            return (QlabStatus.Ok, UNCHANGED)
+
+        restructured = {entry[3]: None for entry in self._journal.since(generation)}
+        if None in restructured:
+            return (QlabStatus.Ok, self.get_cuelists())
+
+        changes = self._changes_since(generation)
+        changes['restructured'] = list(restructured)
+        return (QlabStatus.Ok, changes)
+
+    def _changes_since(self, generation, cuelist_id=None):
+        changed = []
+        removed = []
+        records = self._snapshot.records
+        # Copied first (in a single step, whilst holding the GIL), as changes are recorded from
+        # the main thread whilst this may be called from another
+        for cue_id, (changed_at, parent_id) in list(self._changed_at.items()):
+            if changed_at <= generation:
+                continue
+            if cuelist_id is not None and (parent_id != cuelist_id or cue_id == cuelist_id):
+                continue
+            if cue_id not in records:
+                removed.append(cue_id)
+            else:
+                changed.append(cue_id)
+        return {'changed': changed, 'removed': removed}
+
+    def children_generation(self, cue_id=None, cue_number=None):
+        '''Returns the generation of a cue list, for inclusion with replies about its children.'''
+        cue = self._cue_by_id(cue_id) if cue_id is not None else self._cue_by_number(cue_number)
+        if cue is None or self._cuelists.get(cue.id) is None:
+            return None
+        return self.cuelist_generation(cue)
+
+    def _cue_by_id(self, cue_id):
+        return self._cuelists.get(cue_id) or self._index.by_id(cue_id)
+
+    def _cue_by_number(self, cue_number):
+        if cue_number == 'L': # ListLayout CueList
+            return self.cuelist(0)
+
+        try:
+            if cue_number.startswith('P'): # CartLayout Page
+                return self.cuelist(int(cue_number[1:]) - 1)
+
+            if cue_number == 'selected':
                 cue_num = self.cuelist(0).selected_cue()
             else:
-                cue_num = int(path[1]) - 1
+                cue_num = int(cue_number) - 1
+        except ValueError:
+            return None
 
-            if cue_num > -1:
-                cue = cue_layout.cue_at(cue_num)
+        if cue_num > -1:
+            return self._index.by_index(cue_num)
+        return None
 
-        if cue is None:
+    def values_for_keys_bulk(self, args):
+        '''Handles a request for the values of keys for multiple cues at once.
+
+        /workspace/<id>/cues/valuesForKeys "[<cue id or number>, ...]" "[<key>, ...]"
+
+        The returned data is keyed by each cue's identifier, as given in the request. Cues that
+        cannot be found are omitted.
+        '''
+        identifiers = parse_string_list(args[0]) if len(args) > 1 else None
+        if identifiers is None:
             return (QlabStatus.NotOk, None)
-        del path[0:2]
-        return self._cue_common(cue, path, args)
+
+        data = {}
+        for identifier in identifiers:
+            cue = self._cue_by_id(identifier) or self._cue_by_number(identifier)
+            if cue is None:
+                continue
+            status, values = self._cue_common(cue, ['valuesForKeys'], args[1:2])
+            if status is QlabStatus.Ok:
+                data[identifier] = values
+        return (QlabStatus.Ok, data)
+
+    def by_cue_id_pattern(self, pattern, path, args):
+        # Determine cues based on an OSC address pattern matching their ids
+        try:
+            cues = self._index.match_ids(pattern)
+        except ValueError:
+            return (QlabStatus.NotOk, None)
+        return self._cues_common(cues, path, args)
+
+    def by_cue_number_pattern(self, pattern, path, args):
+        # Determine cues based on an OSC address pattern matching their numbers
+        try:
+            cues = self._index.match_numbers(pattern)
+        except ValueError:
+            return (QlabStatus.NotOk, None)
+        return self._cues_common(cues, path, args)
+
+    def _cues_common(self, cues, path, args):
+        '''Handles a request for multiple cues, aggregating the replies.
+
+        The returned data (if any) is keyed by cue id.
+        '''
+        status = QlabStatus.NotOk
+        data = {}
+        for cue in cues:
+            if cue is None:
+                continue
+            cue_status, cue_data = self._cue_common(cue, path, args)
+            if cue_status is QlabStatus.Ok:
+                status = QlabStatus.Ok
+                if cue_data is not None:
+                    data[cue.id] = cue_data
+        return (status, data or None)
 
     def _cue_common(self, cue, path, args):
         # Handle requests for a cue to start, stop, etc.
@@ -185,17 +676,26 @@ class CuesHandler:
 
         # Handle requests for an arbitrary collection of information about a cue
         if path[0] == 'valuesForKeys':
+            keys = parse_string_list(args[0]) if args else None
+            if keys is None:
+                return (QlabStatus.NotOk, None)
             data = {}
-            for point in literal_eval(args[0]):
-                value = self._cue_info_get(cue, [point])
-                if value is None:
-                    logger.debug('"{}" of cue (type: {}) requested'.format(point, cue.type))
+            record = self._snapshot.get(cue.id)
+            for key, getter, record_getter in self._values_plan(cue.type, keys):
+                if record is not None and record_getter is not None:
+                    value = record_getter(record)
                 else:
-                    data[point] = value
+                    value = getter(cue)
+                if value is not None:
+                    data[key] = value
             return (QlabStatus.Ok, data)
 
+        # Handle requests for (some of) the cues within a cue list or cart page
+        if path[0] == 'children' and (len(path) > 1 or args):
+            return self._cue_children_variant(cue, path[1] if len(path) > 1 else None, args)
+
         # Handle requests that get information
-        info = self._cue_info_get(cue, path) if not args else None
+        info = self._cue_info_get(cue, path[0]) if not args else None
         if info is not None:
             return (QlabStatus.Ok, info)
 
@@ -207,50 +707,90 @@ class CuesHandler:
         # If we've got this far, we don't support or recognise the request
         return (QlabStatus.NotOk, None)
 
-    def _cue_info_get(self, cue, path):
+    def _build_info_getters(self):
+        return {
+            'actionElapsed': lambda cue: self._elapsed_times(cue)[0] / 1000,
+            'armed': lambda cue: True,
+            'cartColumns': lambda cue: self._record(cue).cart_columns,
+            'cartPosition': lambda cue: self._get_cart_position(cue) if cue.type != 'CueCart' else [0, 0],
+            'cartRows': lambda cue: self._record(cue).cart_rows,
+            'children': self._cue_children,
+            'colorName': self._derive_qlab_colour,
+            'continueMode': lambda cue: CUE_NEXT_ACTION_MAPPING.get(cue.next_action, 0),
+            'cueTargetNumber': self._get_cue_target_num,
+            'currentDuration': lambda cue: cue.duration / 1000,
+            'currentCueTarget': self._get_cue_target,
+            'defaultName': lambda cue: translate('CueName', cue.Name),
+            'displayName': lambda cue: cue.name,
+            'duration': lambda cue: cue.duration / 1000,
+            'fileTarget': lambda cue: None if cue.type != 'GstMediaCue' else cue.input_uri, # @todo check the appropriate property
+            'flagged': lambda cue: False,
+            'hasCueTargets': lambda cue: cue.type in TARGETS_OTHER_CUES,
+            'hasFileTargets': lambda cue: cue.type in TARGETS_FILES,
+            'isActionRunning': lambda cue: cue.state == CueState.Running,
+            'isBroken': lambda cue: cue.state == CueState.Error,
+            'isLoaded': lambda cue: True,
+            'isOverridden': lambda cue: False, # whether a cue's output is suppressed by an override control
+            'isPanicking': lambda cue: bool(cue.state & CueState.Interrupt), # is fading out during a 'panic' (all stop)
+            'isPaused': lambda cue: bool(cue.state & CueState.IsPaused),
+            'isRunning': lambda cue: bool(cue.state & CueState.IsRunning),
+            'isTailingOut': lambda cue: False, # if cue has an AudioUnit which is decaying
+            'listName': lambda cue: '* {} *'.format(cue.name),
+            'mode': lambda cue: 5 if cue.type == 'CueCart' else 0, # List: 0, Groups 1-4, Cart: 5
+            'name': lambda cue: cue.name,
+            'notes': lambda cue: cue.description,
+            'number': self._cue_number,
+            'parent': self._cue_parent_id,
+            'percentActionElapsed': lambda cue: self._elapsed_times(cue)[0] / cue.duration if cue.duration else 0,
+            'percentPreWaitElapsed': lambda cue: self._elapsed_times(cue)[1] / cue.pre_wait if cue.pre_wait else 0,
+            'percentPostWaitElapsed': lambda cue: self._elapsed_times(cue)[2] / cue.post_wait if cue.post_wait else 0,
+            'playbackPosition': lambda cue: cue.standby_cue_num() if cue.type == 'CueList' else 'none',
+            'playbackPositionId': lambda cue: cue.standby_cue_id() if cue.type == 'CueList' else 'none',
+            'preWait': lambda cue: cue.pre_wait,
+            'postWait': lambda cue: cue.post_wait,
+            'type': self._derive_qlab_cuetype,
+            'uniqueID': lambda cue: cue.id,
+        }
+
+    @staticmethod
+    def _build_record_getters():
+        '''Getters for those keys whose values may be read from a cue's record in the snapshot.'''
         return {
-            'actionElapsed': lambda: cue.current_time() / 1000,
-            'armed': lambda: True,
-            'cartColumns': lambda: cue.columns if cue.type == 'CueCart' else None,
-            'cartPosition': lambda: self._get_cart_position(cue) if cue.type != 'CueCart' else [0, 0],
-            'cartRows': lambda: cue.rows if cue.type == 'CueCart' else None,
-            'children': lambda: self._cue_children(cue),
-            'colorName': lambda: self._derive_qlab_colour(cue),
-            'continueMode': lambda: CUE_NEXT_ACTION_MAPPING.get(cue.next_action, 0),
-            'cueTargetNumber': lambda: self._get_cue_target_num(cue),
-            'currentDuration': lambda: cue.duration / 1000,
-            'currentCueTarget': lambda: self._get_cue_target(cue),
-            'defaultName': lambda: translate('CueName', cue.Name),
-            'displayName': lambda: cue.name,
-            'duration': lambda: cue.duration / 1000,
-            'fileTarget': lambda: None if cue.type != 'GstMediaCue' else cue.input_uri, # @todo check the appropriate property
-            'flagged': lambda: False,
-            'hasCueTargets': lambda: cue.type in TARGETS_OTHER_CUES,
-            'hasFileTargets': lambda: cue.type in TARGETS_FILES,
-            'isActionRunning': lambda: cue.state == CueState.Running,
-            'isBroken': lambda: cue.state == CueState.Error,
-            'isLoaded': lambda: True,
-            'isOverridden': lambda: False, # whether a cue's output is suppressed by an override control
-            'isPanicking': lambda: bool(cue.state & CueState.Interrupt), # is fading out during a 'panic' (all stop)
-            'isPaused': lambda: bool(cue.state & CueState.IsPaused),
-            'isRunning': lambda: bool(cue.state & CueState.IsRunning),
-            'isTailingOut': lambda: False, # if cue has an AudioUnit which is decaying
-            'listName': lambda: '* {} *'.format(cue.name),
-            'mode': lambda: 5 if cue.type == 'CueCart' else 0, # List: 0, Groups 1-4, Cart: 5
-            'name': lambda: cue.name,
-            'notes': lambda: cue.description,
-            'number': lambda: str(cue.index + 1) if isinstance(cue.index, int) else cue.index,
-            'parent': lambda: self._cue_parent_id(cue),
-            'percentActionElapsed': lambda: cue.current_time() / cue.duration if cue.duration else 0,
-            'percentPreWaitElapsed': lambda: cue.prewait_time() / cue.pre_wait if cue.pre_wait else 0,
-            'percentPostWaitElapsed': lambda: cue.postwait_time() / cue.post_wait if cue.post_wait else 0,
-            'playbackPosition': lambda: cue.standby_cue_num() if cue.type == 'CueList' else 'none',
-            'playbackPositionId': lambda: cue.standby_cue_id() if cue.type == 'CueList' else 'none',
-            'preWait': lambda: cue.pre_wait,
-            'postWait': lambda: cue.post_wait,
-            'type': lambda: self._derive_qlab_cuetype(cue),
-            'uniqueID': lambda: cue.id,
-        }.get(path[0], lambda: None)()
+            'cartColumns': lambda record: record.cart_columns,
+            'cartRows': lambda record: record.cart_rows,
+            'colorName': lambda record: record.colour,
+            'continueMode': lambda record: record.continue_mode,
+            'currentDuration': lambda record: record.duration / 1000,
+            'displayName': lambda record: record.name,
+            'duration': lambda record: record.duration / 1000,
+            'name': lambda record: record.name,
+            'notes': lambda record: record.notes,
+            'preWait': lambda record: record.pre_wait,
+            'postWait': lambda record: record.post_wait,
+            'type': lambda record: record.qlab_type,
+            'uniqueID': lambda record: record.id,
+        }
+
+    def _compile_values_plan(self, cue_type, keys):
+        '''Returns the getters needed to answer a `valuesForKeys` request about a type of cue.
+
+        Each is a tuple of the key, a getter taking the cue, and (if the value may instead be read
+        from the cue's record in the snapshot) a getter taking the record.
+        '''
+        plan = []
+        for key in keys:
+            getter = self._info_getters.get(key)
+            if getter is None:
+                logger.debug('"{}" of cue (type: {}) requested'.format(key, cue_type))
+                continue
+            if key in INFO_KEYS_BY_CUE_TYPE and cue_type not in INFO_KEYS_BY_CUE_TYPE[key]:
+                continue
+            plan.append((key, getter, self._record_getters.get(key)))
+        return tuple(plan)
+
+    def _cue_info_get(self, cue, key):
+        getter = self._info_getters.get(key)
+        return getter(cue) if getter is not None else None
 
     def _cue_info_set(self, cue, path, args):
         #if path[0] == 'armed': # Cues cannot be disarmed in LiSP
@@ -321,51 +861,101 @@ class CuesHandler:
 
         return False
 
-    def _cue_summary(self, cue):
-        cue_obj = {
-            'uniqueID': cue.id, # string
-            'number': str(cue.index + 1) if isinstance(cue.index, int) else cue.index, # string
-            'name': cue.name, # string
-            'listName': cue.name, # string
-            'type': self._derive_qlab_cuetype(cue), # string
-            'colorName': self._derive_qlab_colour(cue), # string
-            'flagged': 'false', # number when setting, string when returning
-            'armed': 'true', # number when setting, string when returning
-        }
-        if cue.type in ['CueCart', 'CueList']:
-            cue_obj['cues'] = self._cue_children(cue)
-
-        return cue_obj
+    def _cue_summary(self, cue, deep=True):
+        summary = self._snapshot.summary(cue.id, deep)
+        if summary is None:
+            # Not yet in the snapshot (having only just been added)
+            summary = self._build_record(cue).summary_with_number(self._cue_number(cue))
+        return summary
+
+    def _cached_summary(self, cue):
+        '''Returns the summary of a cue, excluding any children it may have.'''
+        return self._cue_summary(cue, deep=False)
+
+    def _cue_number(self, cue):
+        number = self._snapshot.numbers.get(cue.id)
+        if number is not None:
+            return number
+        if self._cuelists.get(cue.id) is not None:
+            return cue.index
+        return self._index.number(cue)
 
     def _cue_children(self, cue):
         if cue.type not in ['CueCart', 'CueList']:
             return None
-        cues = []
-        cues_iter = None
-        if cue.type == 'CueCart':
-            cues_iter = self._session_layout.model.iter_page(int(cue.index[1:]) - 1)
-        elif cue.type == 'CueList':
-            cues_iter = self._session_layout.model
+        snapshot = self._snapshot
+        return snapshot.summaries(snapshot.children.get(cue.id, ()), deep=True)
 
-        try:
-            for child in cues_iter:
-                cues.append(self._cue_summary(child))
-        except StopIteration:
-            pass
-        return cues
+    def _cue_children_variant(self, cue, variant, args):
+        '''Handles requests for a subset of the information about a cue's children.
+
+        /cue_id/<id>/children/shallow
+            The summaries of the children, without any cues they may themselves contain.
+
+        /cue_id/<id>/children/paged <offset> [<limit>]
+            The summaries of (up to) `limit` children, starting from the child at `offset`,
+            along with the total number of children.
+
+        /cue_id/<id>/children <generation>
+            What has changed since the given generation of the cue list (see `get_cuelists_since`).
+        '''
+        if cue.type not in ['CueCart', 'CueList']:
+            return (QlabStatus.NotOk, None)
 
-    def cue_parent(self, cue):
+        if variant is None:
+            try:
+                generation = int(args[0])
+            except (TypeError, ValueError):
+                return (QlabStatus.NotOk, None)
+
+            current = self.cuelist_generation(cue)
+            if not self._baseline <= generation <= current \
+                or not self._journal.retains(generation) or any(
+                entry[3] == cue.id for entry in self._journal.since(generation)
+            ):
+                return (QlabStatus.Ok, self._cue_children(cue))
+            if generation == current:
+                return (QlabStatus.Ok, UNCHANGED)
+            return (QlabStatus.Ok, self._changes_since(generation, cue.id))
+
+        snapshot = self._snapshot
+        children = snapshot.children.get(cue.id, ())
+
+        if variant == 'shallow' and not args:
+            return (QlabStatus.Ok, snapshot.summaries(children))
+
+        if variant == 'paged':
+            try:
+                offset = int(args[0]) if args else 0
+                limit = int(args[1]) if len(args) > 1 else None
+            except (TypeError, ValueError):
+                return (QlabStatus.NotOk, None)
+            if offset < 0 or (limit is not None and limit < 0):
+                return (QlabStatus.NotOk, None)
+
+            stop = offset + limit if limit is not None else None
+            return (QlabStatus.Ok, {
+                'offset': offset,
+                'total': len(children),
+                'cues': snapshot.summaries(children[offset:stop], deep=True),
+            })
+
+        return (QlabStatus.NotOk, None)
+
+    def cue_parent(self, cue, pending=False):
         if isinstance(self._session_layout, ListLayout):
             return self.cuelist(0)
 
         if isinstance(self._session_layout, CartLayout):
-            page_num = self._session_layout.to_3d_index(int(cue.index))[0]
-            return self.cuelist(page_num)
+            position = self._index.position(cue, pending)
+            return self.cuelist(position[0]) if position else None
 
         return None
 
     def cuelist(self, cuelist_number):
-        return list(self._cuelists.items())[cuelist_number][1]
+        if 0 <= cuelist_number < len(self._cuelist_order):
+            return self._cuelist_order[cuelist_number]
+        return None
 
     def _cue_parent_id(self, cue):
         if cue.type in ['CueCart', 'CueList']:
@@ -378,15 +968,7 @@ class CuesHandler:
         return 'none'
 
     def _derive_qlab_colour(self, cue):
-        colour = re.search(r'background:#([0-9A-Fa-f]{6});', cue.stylesheet)
-        if not colour:
-            return 'none'
-        colour = colour.group(1)
-        return find_nearest_colour((
-            int(colour[0:2], 16),
-            int(colour[2:4], 16),
-            int(colour[4:6], 16)
-        ))[1]
+        return qlab_colour_from_stylesheet(cue.stylesheet)
 
     def _derive_qlab_cuetype(self, cue):
         cue_type = CUE_TYPE_MAPPING.get(cue.type, None)
@@ -398,8 +980,9 @@ class CuesHandler:
         return cue_type
 
     def _get_cart_position(self, cue):
-        if isinstance(self._session_layout, CartLayout):
-            return [i + 1 for i in self._session_layout.to_3d_index(int(cue.index))[1:3]]
+        position = self._index.position(cue)
+        if position:
+            return [i + 1 for i in position[1:3]]
         return [0, 0]
 
     def _get_cue_target(self, cue):
@@ -414,7 +997,8 @@ class CuesHandler:
             target_cue_num = cue.target_index
             if cue.relative:
                 target_cue_num += cue.index
-            return list(self._session_layout.model.model.keys())[target_cue_num]
+            target = self._index.by_index(target_cue_num)
+            return target.id if target else ''
 
         # SeekCue, VolumeControl
         return cue.target_id if cue.target_id else ''
@@ -428,7 +1012,7 @@ class CuesHandler:
             # it doesn't matter if it isn't a "real" cue number.
             targets = []
             for target in cue.targets:
-                targets.append(str(self._session_layout.model.model.get(target[0]).index + 1))
+                targets.append(str(self._index.by_id(target[0]).index + 1))
             return ", ".join(targets)
 
         if cue.type == 'IndexActionCue':
@@ -440,21 +1024,11 @@ class CuesHandler:
         # SeekCue, VolumeControl
         if not cue.target_id:
             return ''
-        return str(self._session_layout.model.model.get(cue.target_id).index + 1)
+        return str(self._index.by_id(cue.target_id).index + 1)
 
     def get_currently_playing(self, include_paused):
         cues = []
-        if isinstance(self._session_layout, ListLayout):
-            for cue in self._session_layout._running_model:
-                if not include_paused and cue.state & CueState.IsPaused:
-                    continue
-                cues.append(self._cue_summary(cue))
-            return cues
-
-        if isinstance(self._session_layout, CartLayout):
-            for cue in self._session_layout.model:
-                if cue.state & CueState.IsRunning or include_paused and cue.state & CueState.IsPaused:
-                    cues.append(self._cue_summary(cue))
-            return cues
-
+        for cue in self._active_cue_list():
+            if cue.state & CueState.IsRunning or include_paused and cue.state & CueState.IsPaused:
+                cues.append(self._cached_summary(cue))
         return cues
@@ -0,0 +1,102 @@
+# This file is a derivation of work on - and as such shares the same
+# licence as - Linux Show Player
+#
+# Linux Show Player:
+#   Copyright 2012-2022 Francesco Ceruti <ceppofrancy@gmail.com>
+#
+# This file:
+#   Copyright 2022 s0600204
+#
+# Linux Show Player is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Linux Show Player is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Some remote apps send the same message several times in quick succession (for instance, once per
+button "press" event they receive). Acting on every copy could, say, GO two cues instead of one, so
+a message is ignored if the same client sent a message to the same path very recently.
+
+Clients reconnect from new (ephemeral) ports frequently, so a record of every client ever seen
+would grow without limit. Instead, records are dropped once they're older than the window, and
+should there still be too many, the least recently recorded are dropped too.
+"""
+
+from collections import OrderedDict
+from time import monotonic
+
+DUPLICATE_FILTER_CAPACITY = 1024 # entries
+
+
+class DuplicateFilter:
+    '''Detects repeated messages from a client to the same path within a window of time.
+
+    Not thread-safe: to be called from the OSC server's thread only.
+    '''
+
+    def __init__(self, window, capacity=DUPLICATE_FILTER_CAPACITY):
+        self.window = window # seconds
+        self._capacity = capacity
+
+        # (client, path) -> time last received. As entries are (re)inserted at the end as they're
+        # received, they're ordered from oldest to most recent.
+        self._received = OrderedDict()
+
+        self.hits = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._received)
+
+    @property
+    def stats(self):
+        return {
+            'entries': len(self._received),
+            'hits': self.hits,
+            'expired': self.expired,
+            'evicted': self.evicted,
+        }
+
+    def is_duplicate(self, client, path):
+        '''Returns whether a message is a duplicate, otherwise recording its receipt.'''
+        if not self.window:
+            return False
+
+        now = monotonic()
+        self._prune(now)
+
+        key = (client, path)
+        received = self._received.get(key)
+        if received is not None:
+            # Entries older than the window have been pruned, so this must be within it
+            self.hits += 1
+            return True
+
+        self._received[key] = now
+        if len(self._received) > self._capacity:
+            self._received.popitem(last=False)
+            self.evicted += 1
+        return False
+
+    def _prune(self, now):
+        received = self._received
+        expiry = now - self.window
+        while received:
+            key = next(iter(received))
+            if received[key] > expiry:
+                break
+            del received[key]
+            self.expired += 1
+
+    def clear(self):
+        self._received.clear()
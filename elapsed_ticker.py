@@ -0,0 +1,97 @@
+# This file is a derivation of work on - and as such shares the same
+# licence as - Linux Show Player
+#
+# Linux Show Player:
+#   Copyright 2012-2022 Francesco Ceruti <ceppofrancy@gmail.com>
+#
+# This file:
+#   Copyright 2022 s0600204
+#
+# Linux Show Player is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Linux Show Player is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Remote apps display the progress of running cues by repeatedly requesting their elapsed times.
+Each such request would ordinarily query the cue (and thus its media pipeline) afresh, so the cost
+grows with the number of connected clients.
+
+Instead, when enabled, the elapsed times of all running cues are sampled at a fixed rate. Requests
+for elapsed times are answered from the latest sample, and the sample itself is pushed to those
+clients that have asked to receive it.
+"""
+
+import logging
+from threading import Event, Thread
+
+logger = logging.getLogger(__name__) # pylint: disable=invalid-name
+
+
+class ElapsedTicker:
+
+    def __init__(self, get_cues, publish):
+        self._get_cues = get_cues
+        self._publish = publish
+        self._interval = 0
+        self._samples = {}
+        self._stopping = Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self, rate):
+        '''Starts sampling `rate` times per second.'''
+        self.stop()
+        if rate <= 0:
+            return
+
+        self._interval = 1 / rate
+        self._stopping.clear()
+        self._thread = Thread(target=self._run, name='QlabMimicElapsedTicker', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+        self._samples = {}
+
+    def sample(self, cue):
+        '''Returns a tuple of a cue's elapsed action, pre-wait, and post-wait times (in ms).
+
+        Returns `None` if the cue was not running when last sampled.
+        '''
+        return self._samples.get(cue.id)
+
+    def _run(self):
+        while not self._stopping.wait(self._interval):
+            try:
+                self._tick()
+            except Exception: # pylint: disable=broad-except
+                logger.exception('Unable to sample elapsed times of running cues.')
+
+    def _tick(self):
+        samples = {}
+        for cue in self._get_cues():
+            samples[cue.id] = (cue.current_time(), cue.prewait_time(), cue.postwait_time())
+
+        had_samples = bool(self._samples)
+        self._samples = samples
+
+        # Once nothing is running, a single empty update is sent to say so
+        if samples or had_samples:
+            self._publish(samples)
@@ -0,0 +1,80 @@
+# This file is a derivation of work on - and as such shares the same
+# licence as - Linux Show Player
+#
+# Linux Show Player:
+#   Copyright 2012-2022 Francesco Ceruti <ceppofrancy@gmail.com>
+#
+# This file:
+#   Copyright 2022 s0600204
+#
+# Linux Show Player is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Linux Show Player is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Encoding of the JSON replies sent to remote apps.
+
+Replies to requests such as `/cueLists` consist largely of cue summaries that seldom change
+between requests. Such summaries may be encoded once, kept, and then spliced (as `JsonFragment`s)
+into later replies verbatim, instead of being re-encoded each time.
+
+If `orjson` is installed, it is used to encode everything else; otherwise the standard library's
+encoder is used.
+"""
+
+from json import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None # pylint: disable=invalid-name
+
+_ENCODER = JSONEncoder(separators=(',', ':'))
+
+
+class JsonFragment(str):
+    '''A string of already-encoded JSON, to be included in a reply as-is.'''
+    __slots__ = ()
+
+
+def encode_json(obj):
+    '''Returns `obj` encoded as a (compact) JSON string.'''
+    if isinstance(obj, JsonFragment):
+        return obj
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj).decode('utf-8')
+        except TypeError:
+            # orjson is stricter about what it accepts (e.g. non-string keys)
+            pass
+    return _ENCODER.encode(obj)
+
+def join_fragments(fragments):
+    '''Returns a `JsonFragment` of an array containing the given fragments.'''
+    return JsonFragment('[' + ','.join(fragments) + ']')
+
+def extend_fragment(fragment, key, value_fragment):
+    '''Returns a copy of an (encoded) JSON object, with an additional (encoded) member.'''
+    return JsonFragment(fragment[:-1] + ',' + encode_json(key) + ':' + value_fragment + '}')
+
+def encode_reply(address, status, workspace_id=None, data=None, generation=None):
+    '''Returns a reply (as sent in response to a request) encoded as JSON.'''
+    parts = ['{"address":', encode_json(address), ',"status":', encode_json(status)]
+    if workspace_id is not None:
+        parts += [',"workspace_id":', encode_json(workspace_id)]
+    if generation is not None:
+        parts += [',"generation":', str(generation)]
+    if data is not None:
+        parts += [',"data":', encode_json(data)]
+    parts.append('}')
+    return ''.join(parts)
@@ -0,0 +1,107 @@
+# This file is a derivation of work on - and as such shares the same
+# licence as - Linux Show Player
+#
+# Linux Show Player:
+#   Copyright 2012-2022 Francesco Ceruti <ceppofrancy@gmail.com>
+#
+# This file:
+#   Copyright 2022 s0600204
+#
+# Linux Show Player is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Linux Show Player is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Handlers that change anything (starting cues, moving the playhead, etc.) call into LiSP's layout
+and cues, which otherwise are only ever used from the main (Qt) thread. Thus such handlers are run
+there, rather than in the thread that receives (or schedules) the messages.
+
+Handing over to the main thread means waiting for Qt's event loop to get to it, so messages are
+handed over in batches: whilst one batch is waiting, further messages are added to it, rather than
+each being handed over separately.
+
+Queries are answered elsewhere, and so could overtake a change sent before them by the same client
+(which would then be told the value from before its change). So whilst a client has messages
+waiting to be handled here, its queries are handed over too, to be handled after them.
+"""
+
+import logging
+from collections import Counter
+from threading import Lock
+from time import monotonic
+
+from lisp.core.signal import Connection, Signal
+
+from .scheduler import LatencyStats
+from .utility import client_id_string, MessageClass
+
+logger = logging.getLogger(__name__) # pylint: disable=invalid-name
+
+
+class MainThreadDispatcher:
+
+    def __init__(self):
+        self._lock = Lock()
+        self._pending = []
+        self._pending_clients = Counter() # client id -> messages waiting to be handled
+        self._batches = 0
+
+        # The time from each message's receipt until its handler was started
+        self._latency = {message_class: LatencyStats() for message_class in MessageClass}
+
+        self._hop = Signal()
+        self._hop.connect(self._run_batch, Connection.QtQueued)
+
+    @property
+    def stats(self):
+        handled = sum(latency.count for latency in self._latency.values())
+        stats = {
+            message_class.name.lower(): latency.as_dict()
+            for message_class, latency in self._latency.items() if latency.count
+        }
+        stats['batches'] = self._batches
+        stats['mean_batch_size'] = round(handled / self._batches, 2) if self._batches else 0
+        return stats
+
+    def has_pending(self, src):
+        '''Returns whether messages from a client are waiting to be handled.'''
+        with self._lock:
+            return client_id_string(src) in self._pending_clients
+
+    def submit(self, handler, request):
+        with self._lock:
+            self._pending.append((handler, request))
+            self._pending_clients[client_id_string(request.src)] += 1
+            if len(self._pending) > 1:
+                # A batch is already waiting to be run
+                return
+        self._hop.emit()
+
+    def _run_batch(self):
+        with self._lock:
+            batch = self._pending
+            self._pending = []
+        self._batches += 1
+
+        for handler, request in batch:
+            self._latency[request.message_class].record(monotonic() - request.received_at)
+            try:
+                handler(request)
+            except Exception: # pylint: disable=broad-except
+                logger.exception(f"Error handling OSC message to '{request.path}'.")
+
+            client_id = client_id_string(request.src)
+            with self._lock:
+                self._pending_clients[client_id] -= 1
+                if not self._pending_clients[client_id]:
+                    del self._pending_clients[client_id]
@@ -0,0 +1,345 @@
+# This file is a derivation of work on - and as such shares the same
+# licence as - Linux Show Player
+#
+# Linux Show Player:
+#   Copyright 2012-2022 Francesco Ceruti <ceppofrancy@gmail.com>
+#
+# This file:
+#   Copyright 2022 s0600204
+#
+# Linux Show Player is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Linux Show Player is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+An OSC-over-TCP server built upon `asyncio`, as an alternative to that built upon liblo.
+
+All connections are serviced by a single event loop, running in its own thread. Writes never
+block the caller: they are handed to the event loop, which buffers them per connection. Should a
+client stop reading, the connection's transport pauses us; a client that then accumulates too
+many further messages is disconnected.
+
+The public interface matches that of `OscTcpServer`, so the two may be used interchangeably.
+"""
+
+import asyncio
+import logging
+from threading import Event, Thread
+
+from lisp.core.signal import Signal
+from lisp.core.util import get_lan_ip
+from lisp.ui.ui_utils import translate
+
+from .osc_codec import decode_packet, encode_message, frame_packet, SLIP_DOUBLE, StreamDeframer
+from .utility import CLIENT_BACKLOG_LIMIT
+
+logger = logging.getLogger(__name__)
+
+MAX_PACKET_SIZE = 1024 * 1024 # bytes
+SHUTDOWN_TIMEOUT = 1 # seconds
+WRITE_BUFFER_HIGH_WATER = 64 * 1024 # bytes
+
+
+class OscAddress:
+    '''Identifies a connected client; a stand-in for `liblo.Address`.'''
+
+    def __init__(self, connection, hostname, port):
+        self._connection = connection
+        self.hostname = hostname
+        self.port = port
+        self.url = f'osc.tcp://{hostname}:{port}/'
+
+    @property
+    def connection(self):
+        return self._connection
+
+    def set_slip_enabled(self, mode):
+        self._connection.slip_mode = mode
+
+
+class OscConnection(asyncio.Protocol):
+
+    def __init__(self, server):
+        self._server = server
+        self._deframer = StreamDeframer(MAX_PACKET_SIZE)
+        self._transport = None
+        self._paused = False
+        self._backlog = 0
+        self.address = None
+        self.slip_mode = None
+
+    def connection_made(self, transport):
+        self._transport = transport
+        self._transport.set_write_buffer_limits(high=WRITE_BUFFER_HIGH_WATER)
+        hostname, port = transport.get_extra_info('peername')[0:2]
+        self.address = OscAddress(self, hostname, port)
+        self._server.connection_made(self)
+
+    def connection_lost(self, exc):
+        self._transport = None
+        self._server.connection_lost(self)
+
+    def data_received(self, data):
+        try:
+            packets = self._deframer.feed(data)
+        except ValueError:
+            logger.warning(f"Malformed data received from '{self.address.url}'. Disconnecting.")
+            self._transport.abort()
+            return
+
+        for packet in packets:
+            try:
+                messages = decode_packet(packet)
+            except ValueError:
+                # (As raised by the codec for any packet it's unable to decode)
+                logger.debug(f"Ignoring malformed OSC packet from '{self.address.url}'.")
+                continue
+            for path, args, types in messages:
+                self._server.dispatch(path, args, types, self.address)
+
+    @property
+    def backlog(self):
+        '''The number of messages written since the client stopped reading.'''
+        return self._backlog if self._paused else 0
+
+    def pause_writing(self):
+        self._paused = True
+        self._backlog = 0
+
+    def resume_writing(self):
+        self._paused = False
+
+    def write(self, packet, framed=None):
+        '''Frames and writes a packet.
+
+        `framed` may be a dict, shared between connections sent the same packet, in which the
+        packet is cached once framed in each mode.
+        '''
+        if self._transport is None or self._transport.is_closing():
+            return
+
+        if self._paused:
+            # The client isn't reading what we've already sent it
+            self._backlog += 1
+            if self._backlog > self._server.backlog_limit:
+                logger.warning(
+                    f"Client at '{self.address.url}' has more than {self._server.backlog_limit} "
+                    f"messages waiting to be sent to it. Evicting."
+                )
+                self._transport.abort()
+                self._server.client_evicted.emit(self.address)
+                return
+
+        slip_mode = (self.slip_mode if self.slip_mode is not None else self._deframer.slip_mode) or 0
+        if framed is None:
+            self._transport.write(frame_packet(packet, slip_mode))
+            return
+
+        if slip_mode not in framed:
+            framed[slip_mode] = memoryview(frame_packet(packet, slip_mode))
+        self._transport.write(framed[slip_mode])
+
+    def abort(self):
+        if self._transport is not None:
+            self._transport.abort()
+
+    def close(self):
+        if self._transport is not None:
+            self._transport.close()
+
+
+class OscAsyncTcpServer:
+
+    SLIP_DOUBLE = SLIP_DOUBLE
+
+    def __init__(self, port, backlog_limit=CLIENT_BACKLOG_LIMIT):
+        self._port = port
+        self._loop = None
+        self._thread = None
+        self._server = None
+        self._running = False
+        self._methods = []
+        self._connections = set()
+        self.backlog_limit = backlog_limit
+
+        self.new_message = Signal()
+        self.client_evicted = Signal()
+
+    @property
+    def port(self):
+        return self._port
+
+    @port.setter
+    def port(self, port):
+        self._port = port
+        self.stop()
+        self.start()
+
+    @property
+    def ip(self):
+        return get_lan_ip()
+
+    @property
+    def url(self):
+        return f'osc.tcp://{self.ip}:{self._port}/' if self._running else None
+
+    def is_running(self):
+        return self._running
+
+    def register_method(self, callback, path=None, types=None):
+        self._methods.append((callback, path, types))
+
+    def start(self):
+        if self._running:
+            return
+
+        started = Event()
+        self._loop = asyncio.new_event_loop()
+        self._thread = Thread(
+            target=self._run, args=(started,), name='OscAsyncTcpServer', daemon=True)
+        self._thread.start()
+        started.wait()
+
+        if self._server is None:
+            self._thread.join()
+            self._loop.close()
+            self._loop = None
+            self._thread = None
+            return
+
+        self._running = True
+        logger.info(
+            translate(
+                "OscServerInfo", "OSC server started at {}"
+            ).format(self.url)
+        )
+
+    def _run(self, started):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._server = self._loop.run_until_complete(
+                self._loop.create_server(lambda: OscConnection(self), port=self._port))
+        except OSError:
+            logger.exception(
+                 translate("OscServerError", "Cannot start OSC server")
+            )
+            return
+        finally:
+            started.set()
+
+        self._loop.run_forever()
+
+    def stop(self):
+        if not self._running:
+            return
+
+        self._running = False
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+        self._thread = None
+        self._server = None
+        logger.info(translate("OscServerInfo", "OSC server stopped"))
+
+    async def _shutdown(self):
+        self._server.close()
+        for connection in list(self._connections):
+            connection.close()
+
+        # Give any buffered messages (such as disconnect notifications) a chance to be sent
+        for _ in range(int(SHUTDOWN_TIMEOUT / 0.01)):
+            if not self._connections:
+                break
+            await asyncio.sleep(0.01)
+
+        for connection in list(self._connections):
+            connection.abort()
+
+    def connection_made(self, connection):
+        self._connections.add(connection)
+
+    def connection_lost(self, connection):
+        self._connections.discard(connection)
+
+    def dispatch(self, path, args, types, src):
+        # As with liblo: methods are tried in the order they were registered, and a method
+        # returning a non-zero integer allows the message to be passed on to the next
+        for callback, method_path, method_types in self._methods:
+            if method_path is not None and method_path != path:
+                continue
+            if method_types is not None and method_types != types:
+                continue
+            if not self._call(callback, path, args, types, src, None):
+                return
+        self._call(self.new_message.emit, path, args, types, src, self)
+
+    @staticmethod
+    def _call(callback, *args):
+        try:
+            result = callback(*args)
+        except Exception: # pylint: disable=broad-except
+            logger.exception(f"Error handling OSC message to '{args[0]}'.")
+            return False
+        return isinstance(result, int) and result
+
+    def send(self, address, path, *args):
+        '''Queues a message for sending.
+
+        Returns `False` if the address is invalid, or its connection has been closed.
+        '''
+        if not address.hostname or not self._running:
+            return bool(address.hostname)
+
+        if address.connection not in self._connections:
+            return False
+
+        self._loop.call_soon_threadsafe(address.connection.write, encode_message(path, *args))
+        return True
+
+    def queue_depth(self, address):
+        '''Returns the number of messages waiting to be sent to a client.'''
+        if address.connection not in self._connections:
+            return 0
+        return address.connection.backlog
+
+    def broadcast(self, addresses, path, *args):
+        '''Queues the same message for sending to each of several clients.
+
+        The message is encoded (and framed, per framing mode) only the once, with the same buffer
+        then written to each client's connection.
+
+        Returns a list of those addresses the message could not be queued for.
+        '''
+        if not self._running:
+            return [address for address in addresses if not address.hostname]
+
+        failed = []
+        connections = []
+        for address in addresses:
+            if address.hostname and address.connection in self._connections:
+                connections.append(address.connection)
+            else:
+                failed.append(address)
+
+        if connections:
+            self._loop.call_soon_threadsafe(
+                self._write_all, connections, encode_message(path, *args))
+        return failed
+
+    @staticmethod
+    def _write_all(connections, packet):
+        framed = {}
+        for connection in connections:
+            connection.write(packet, framed)
@@ -0,0 +1,297 @@
+# This file is a derivation of work on - and as such shares the same
+# licence as - Linux Show Player
+#
+# Linux Show Player:
+#   Copyright 2012-2022 Francesco Ceruti <ceppofrancy@gmail.com>
+#
+# This file:
+#   Copyright 2022 s0600204
+#
+# Linux Show Player is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Linux Show Player is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Encoding and decoding of OSC packets, and their framing for transmission over a TCP stream.
+
+OSC v1.0 frames packets sent over a stream by prefixing each with its length (as a big-endian
+int32). OSC v1.1 instead uses SLIP (RFC 1055), terminating each packet with an END byte. Some
+remote apps (see the README) additionally require each packet to *begin* with an END byte, which
+we refer to as "double END" SLIP.
+
+Links:
+* https://opensoundcontrol.stanford.edu/spec-1_0.html
+* https://opensoundcontrol.stanford.edu/spec-1_1.html
+* https://datatracker.ietf.org/doc/html/rfc1055
+"""
+
+import struct
+
+# Framing modes. (Values chosen to match those of liblo.)
+SLIP_DISABLED = 0
+SLIP_ENABLED = 1
+SLIP_DOUBLE = 2
+
+SLIP_END = 0xC0
+SLIP_ESC = 0xDB
+SLIP_ESC_END = 0xDC
+SLIP_ESC_ESC = 0xDD
+
+BUNDLE_TAG = b'#bundle\x00'
+MAX_BUNDLE_DEPTH = 16
+
+INT32_MIN = -2 ** 31
+INT32_MAX = 2 ** 31 - 1
+
+_INT32 = struct.Struct('>i')
+_UINT32 = struct.Struct('>I')
+_INT64 = struct.Struct('>q')
+_UINT64 = struct.Struct('>Q')
+_FLOAT = struct.Struct('>f')
+_DOUBLE = struct.Struct('>d')
+
+
+def _padded(data):
+    '''Pads `data` (with NULLs) to a multiple of four bytes.'''
+    return data + b'\x00' * (4 - len(data) % 4 if len(data) % 4 else 0)
+
+def _encode_string(value):
+    # A string is always NULL-terminated, then padded.
+    return _padded(value.encode('utf-8') + b'\x00')
+
+def _encode_arg(arg):
+    '''Returns a tuple of the type tag and encoded data of an argument.'''
+    # `bool` is a subclass of `int`, so must be checked for first
+    if arg is True:
+        return 'T', b''
+    if arg is False:
+        return 'F', b''
+    if arg is None:
+        return 'N', b''
+    if isinstance(arg, int):
+        if INT32_MIN <= arg <= INT32_MAX:
+            return 'i', _INT32.pack(arg)
+        return 'h', _INT64.pack(arg)
+    if isinstance(arg, float):
+        return 'f', _FLOAT.pack(arg)
+    if isinstance(arg, str):
+        return 's', _encode_string(arg)
+    if isinstance(arg, (bytes, bytearray, memoryview)):
+        arg = bytes(arg)
+        return 'b', _INT32.pack(len(arg)) + _padded(arg)
+    raise TypeError(f"Unable to encode argument of type '{type(arg).__name__}' as OSC.")
+
+def encode_message(path, *args):
+    '''Returns an OSC message, as bytes.'''
+    tags = [',']
+    data = []
+    for arg in args:
+        tag, encoded = _encode_arg(arg)
+        tags.append(tag)
+        data.append(encoded)
+    return b''.join([_encode_string(path), _encode_string(''.join(tags))] + data)
+
+def _padded_size(size):
+    return size + (4 - size % 4 if size % 4 else 0)
+
+def _string_size(value):
+    return _padded_size((len(value) if value.isascii() else len(value.encode('utf-8'))) + 1)
+
+def encoded_size(path, *args):
+    '''Returns the size (in bytes) of an OSC message, without encoding it.'''
+    size = _string_size(path) + _padded_size(len(args) + 2)
+    for arg in args:
+        if arg is True or arg is False or arg is None:
+            continue
+        if isinstance(arg, str):
+            size += _string_size(arg)
+        elif isinstance(arg, (bytes, bytearray, memoryview)):
+            size += 4 + _padded_size(len(arg))
+        elif isinstance(arg, int) and not INT32_MIN <= arg <= INT32_MAX:
+            size += 8
+        else:
+            size += 4
+    return size
+
+def _read_string(data, offset):
+    end = data.index(b'\x00', offset)
+    value = data[offset:end].decode('utf-8')
+    # Skip the terminating NULL and any padding
+    return value, (end + 4) & ~3
+
+def _read_arg(tag, data, offset):
+    # pylint: disable=too-many-return-statements
+    if tag == 'i':
+        return _INT32.unpack_from(data, offset)[0], offset + 4
+    if tag == 'f':
+        return _FLOAT.unpack_from(data, offset)[0], offset + 4
+    if tag in 'sS':
+        return _read_string(data, offset)
+    if tag == 'b':
+        length = _INT32.unpack_from(data, offset)[0]
+        offset += 4
+        blob = data[offset:offset + length]
+        if len(blob) != length:
+            raise ValueError('Truncated OSC blob.')
+        return blob, offset + ((length + 3) & ~3)
+    if tag == 'h':
+        return _INT64.unpack_from(data, offset)[0], offset + 8
+    if tag == 't':
+        return _UINT64.unpack_from(data, offset)[0], offset + 8
+    if tag == 'd':
+        return _DOUBLE.unpack_from(data, offset)[0], offset + 8
+    if tag == 'c':
+        return chr(_UINT32.unpack_from(data, offset)[0]), offset + 4
+    if tag in 'mr':
+        return tuple(data[offset:offset + 4]), offset + 4
+    if tag == 'T':
+        return True, offset
+    if tag == 'F':
+        return False, offset
+    if tag == 'N':
+        return None, offset
+    if tag == 'I':
+        return float('inf'), offset
+    raise ValueError(f"Unsupported OSC type tag '{tag}'.")
+
+def decode_message(data):
+    '''Returns a tuple of the path, arguments, and type tags of an OSC message.'''
+    path, offset = _read_string(data, 0)
+    if offset >= len(data):
+        # Pre-v1.0 messages may lack a type tag string entirely
+        raise ValueError(f"OSC message to '{path}' is missing its type tags.")
+
+    tags, offset = _read_string(data, offset)
+    if not tags.startswith(','):
+        raise ValueError(f"OSC message to '{path}' has malformed type tags.")
+
+    args = []
+    try:
+        for tag in tags[1:]:
+            value, offset = _read_arg(tag, data, offset)
+            args.append(value)
+    except struct.error:
+        raise ValueError(f"OSC message to '{path}' has truncated arguments.") from None
+    return path, args, tags[1:]
+
+def decode_packet(data):
+    '''Returns a list of the messages contained within an OSC packet.
+
+    Bundles are flattened, and their time tags ignored: messages are to be acted on immediately.
+
+    Bundles are read without recursion (and without copying the bundles within), as a client
+    may nest them arbitrarily deeply; those nested deeper than `MAX_BUNDLE_DEPTH` are refused.
+    '''
+    messages = []
+    # The (start, end, depth) of each element yet to be read, the next last
+    pending = [(0, len(data), 0)]
+    while pending:
+        start, end, depth = pending.pop()
+        if data[start:start + 8] != BUNDLE_TAG:
+            messages.append(decode_message(data[start:end]))
+            continue
+        if depth >= MAX_BUNDLE_DEPTH:
+            raise ValueError('OSC bundles are nested too deeply.')
+
+        elements = []
+        offset = start + 16 # Bundle tag, then time tag
+        while offset < end:
+            if offset + 4 > end:
+                raise ValueError('OSC bundle has a truncated element.')
+            length = _INT32.unpack_from(data, offset)[0]
+            offset += 4
+            if length < 0 or offset + length > end:
+                raise ValueError('OSC bundle has an element of invalid length.')
+            elements.append((offset, offset + length, depth + 1))
+            offset += length
+        pending.extend(reversed(elements))
+    return messages
+
+def frame_packet(packet, slip_mode):
+    '''Frames a packet for transmission over a TCP stream.'''
+    if slip_mode == SLIP_DISABLED:
+        return _INT32.pack(len(packet)) + packet
+
+    escaped = packet.replace(
+        bytes([SLIP_ESC]), bytes([SLIP_ESC, SLIP_ESC_ESC])
+    ).replace(
+        bytes([SLIP_END]), bytes([SLIP_ESC, SLIP_ESC_END])
+    )
+    if slip_mode == SLIP_DOUBLE:
+        return bytes([SLIP_END]) + escaped + bytes([SLIP_END])
+    return escaped + bytes([SLIP_END])
+
+
+class StreamDeframer:
+    '''Splits a TCP stream back into the OSC packets it carries.
+
+    The framing used is determined from the first byte received: a length prefix will (for any
+    packet of sane size) begin with a NULL, whereas a SLIP-encoded packet will begin with either
+    an END byte, or the first character of an OSC path or bundle tag.
+    '''
+
+    def __init__(self, max_packet_size):
+        self._buffer = bytearray()
+        self._max_packet_size = max_packet_size
+        self.slip_mode = None
+
+    def feed(self, data):
+        '''Returns a list of any packets completed by `data`.'''
+        self._buffer.extend(data)
+        if self.slip_mode is None and self._buffer:
+            self.slip_mode = SLIP_DISABLED if self._buffer[0] == 0 else SLIP_ENABLED
+
+        if self.slip_mode == SLIP_DISABLED:
+            packets = self._read_length_prefixed()
+        else:
+            packets = self._read_slip()
+
+        if len(self._buffer) > self._max_packet_size:
+            raise ValueError('Incoming OSC packet exceeds maximum permitted size.')
+        return packets
+
+    def _read_length_prefixed(self):
+        packets = []
+        offset = 0
+        while len(self._buffer) - offset >= 4:
+            length = _INT32.unpack_from(self._buffer, offset)[0]
+            if length < 0 or length > self._max_packet_size:
+                raise ValueError('Incoming OSC packet has an invalid length.')
+            if len(self._buffer) - offset - 4 < length:
+                break
+            packets.append(bytes(self._buffer[offset + 4:offset + 4 + length]))
+            offset += 4 + length
+        del self._buffer[:offset]
+        return packets
+
+    def _read_slip(self):
+        packets = []
+        offset = 0
+        while True:
+            end = self._buffer.find(SLIP_END, offset)
+            if end == -1:
+                break
+            # Empty packets occur between the END bytes of "double END" SLIP, and are ignored
+            if end > offset:
+                packets.append(self._slip_unescape(self._buffer[offset:end]))
+            offset = end + 1
+        del self._buffer[:offset]
+        return packets
+
+    @staticmethod
+    def _slip_unescape(data):
+        return bytes(data).replace(
+            bytes([SLIP_ESC, SLIP_ESC_END]), bytes([SLIP_END])
+        ).replace(
+            bytes([SLIP_ESC, SLIP_ESC_ESC]), bytes([SLIP_ESC])
+        )
@@ -20,27 +20,74 @@
 # You should have received a copy of the GNU General Public License
 # along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
 
+from collections import deque
 import logging
-from threading import Lock
+from threading import Condition, Lock, Thread
 
-from liblo import ServerError, ServerThread, TCP
+from liblo import Message, ServerError, ServerThread, SLIP_DOUBLE, TCP
 
 from lisp.core.signal import Signal
 from lisp.core.util import get_lan_ip
 from lisp.ui.ui_utils import translate
 
+from .utility import client_id_string, CLIENT_BACKLOG_LIMIT
+
 logger = logging.getLogger(__name__)
 
+SENDER_STOP_TIMEOUT = 1 # seconds
+
+# Updates pushed to clients, as opposed to replies to their requests
+UPDATE_PATH_PREFIX = '/update/'
+
+
+class ClientQueue:
+    '''Messages waiting to be sent to a single client.'''
+
+    def __init__(self):
+        self.messages = deque()
+        self.pending = set()
+
+    def __len__(self):
+        return len(self.messages)
+
+    def push(self, address, key, message):
+        '''Appends a message. If `key` is not `None`, identical messages waiting are coalesced.'''
+        if key is None:
+            self.messages.append((address, key, message))
+            return
+        if key in self.pending:
+            # An identical message is already waiting to be sent, so there is no need for another
+            return
+        self.pending.add(key)
+        self.messages.append((address, key, message))
+
+    def pop(self):
+        address, key, message = self.messages.popleft()
+        self.pending.discard(key)
+        return address, message
+
+
 class OscTcpServer:
 
-    def __init__(self, port):
+    SLIP_DOUBLE = SLIP_DOUBLE
+
+    def __init__(self, port, backlog_limit=CLIENT_BACKLOG_LIMIT):
         self._port = port
         self._srv = None
         self._running = False
         self._lock = Lock()
         self._methods = []
 
+        # Outgoing messages are queued per client, and sent from a dedicated thread, so that
+        # the thread calling `send()` is never blocked by a slow (or stalled) client.
+        self._queues = {}
+        self._queues_changed = Condition()
+        self._sender = None
+        self._sending = False
+        self.backlog_limit = backlog_limit
+
         self.new_message = Signal()
+        self.client_evicted = Signal()
 
     @property
     def port(self):
@@ -76,9 +123,13 @@ class OscTcpServer:
                 self._srv.add_method(method[1], method[2], method[0])
             self._srv.add_method(None, None, self.new_message.emit, self._srv)
             self._srv.start()
-            
+
             self._running = True
-            
+
+            self._sending = True
+            self._sender = Thread(target=self._sender_loop, name='OscTcpServerSender', daemon=True)
+            self._sender.start()
+
             logger.info(
                 translate(
                     "OscServerInfo", "OSC server started at {}"
@@ -90,6 +141,14 @@ class OscTcpServer:
             )
 
     def stop(self):
+        if self._sender is not None:
+            with self._queues_changed:
+                self._sending = False
+                self._queues_changed.notify()
+            # Give any queued messages (such as disconnect notifications) a chance to be sent
+            self._sender.join(SENDER_STOP_TIMEOUT)
+            self._sender = None
+
         if self._srv is not None:
             with self._lock:
                 if self._running:
@@ -100,15 +159,97 @@ class OscTcpServer:
             logger.info(translate("OscServerInfo", "OSC server stopped"))
 
     def send(self, address, path, *args):
+        '''Queues a message for sending.
+
+        Returns `False` if the message could not be queued; either because the address is
+        invalid, or because the client has too many messages waiting for it already and has thus
+        been evicted.
+        '''
         if not address.hostname:
             return False
+        return not self._enqueue([address], self._coalesce_key(path, args), Message(path, *args))
+
+    def broadcast(self, addresses, path, *args):
+        '''Queues the same message for sending to each of several clients.
+
+        The message is built only the once, and shared between the clients' queues.
+
+        Returns a list of those addresses the message could not be queued for.
+        '''
+        failed = [address for address in addresses if not address.hostname]
+        addresses = [address for address in addresses if address.hostname]
+        if addresses:
+            failed.extend(self._enqueue(addresses, self._coalesce_key(path, args), Message(path, *args)))
+        return failed
+
+    @staticmethod
+    def _coalesce_key(path, args):
+        '''Returns the key by which a message waiting to be sent may be coalesced with another.
+
+        Only updates are coalesced: a client sending the same request twice expects two replies.
+        '''
+        return (path, args) if path.startswith(UPDATE_PATH_PREFIX) else None
+
+    def queue_depth(self, address):
+        '''Returns the number of messages waiting to be sent to a client.'''
+        queue = self._queues.get(client_id_string(address))
+        return len(queue) if queue is not None else 0
+
+    def _enqueue(self, addresses, key, message):
+        evicted = []
+        with self._queues_changed:
+            if not self._sending:
+                return evicted
+
+            for address in addresses:
+                client_id = client_id_string(address)
+                queue = self._queues.get(client_id)
+                if queue is None:
+                    queue = self._queues[client_id] = ClientQueue()
+
+                if len(queue) >= self.backlog_limit:
+                    del self._queues[client_id]
+                    evicted.append(address)
+                else:
+                    queue.push(address, key, message)
+            self._queues_changed.notify()
+
+        for address in evicted:
+            logger.warning(
+                f"Client at '{client_id_string(address)}' has more than {self.backlog_limit} "
+                f"messages waiting to be sent to it. Evicting."
+            )
+            self.client_evicted.emit(address)
+
+        return evicted
+
+    def _sender_loop(self):
+        while True:
+            with self._queues_changed:
+                while self._sending and not self._queues:
+                    self._queues_changed.wait()
+
+                if not self._queues:
+                    return
+
+                # Take one message from each waiting client in turn, so that a client with a
+                # large backlog doesn't delay messages to all the others.
+                batch = []
+                for client_id, queue in list(self._queues.items()):
+                    batch.append(queue.pop())
+                    if not queue:
+                        del self._queues[client_id]
+
+            for address, message in batch:
+                self._send_now(address, message)
 
+    def _send_now(self, address, message):
         with self._lock:
-            if self._running:
-                try:
-                    self._srv.send(address, path, *args)
-                except OSError: # "Broken Pipe"
-                    # It appears we can ignore this, as subsequent messages still get sent,
-                    # but not catching it causes LiSP to crash to desktop.
-                    logger.warning(f"Hiccup in connection when sending message.")
-        return True
+            if not self._running:
+                return
+            try:
+                self._srv.send(address, message)
+            except OSError: # "Broken Pipe"
+                # It appears we can ignore this, as subsequent messages still get sent,
+                # but not catching it causes LiSP to crash to desktop.
+                logger.warning(f"Hiccup in connection when sending message.")
@@ -78,14 +78,16 @@ class CueCart(Cue):
 
 class CueList(Cue):
 
-    def __init__(self, layout, *args, **kwargs):
+    def __init__(self, layout, cue_index, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.name = translate('CueName', 'Main Cue List')
         self.index = 'L'
         self._layout = layout
+        self._cue_index = cue_index
 
     def deinit(self):
         del self._layout
+        del self._cue_index
 
     def selected_cue(self):
         return self._layout.standby_index()
@@ -103,11 +105,11 @@ class CueList(Cue):
         return str(cue_num)
 
     def set_standby_id(self, cue_id):
-        for cue in self._layout.cues():
-            if cue.id == cue_id:
-                self._layout.set_standby_index(cue.index)
-                return True
-        return False
+        cue = self._cue_index.by_id(cue_id)
+        if cue is None:
+            return False
+        self._layout.set_standby_index(cue.index)
+        return True
 
     def set_standby_num(self, cue_num):
         self._layout.set_standby_index(cue_num)
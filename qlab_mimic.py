@@ -20,31 +20,50 @@
 # You should have received a copy of the GNU General Public License
 # along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
 
-from json import JSONEncoder
 import logging
-import time
+from time import monotonic
 from uuid import uuid4
 
-from liblo import SLIP_DOUBLE
-
 # pylint: disable=import-error
+from PyQt5.QtCore import QTimer
+
 from lisp.core.plugin import Plugin
 from lisp.core.util import get_lan_ip
 from lisp.plugins.list_layout.layout import ListLayout
 from lisp.ui.settings.app_configuration import AppConfigurationDialog
 from lisp.ui.ui_utils import translate
 
-from .cues_handler import CuesHandler, CUE_STATE_CHANGES
-from .osc_tcp_server import OscTcpServer
+from .client_registry import ClientRegistry
+from .cues_handler import cue_message_class, CuesHandler, CUE_STATE_CHANGES
+from .duplicate_filter import DuplicateFilter
+from .json_writer import encode_json, encode_reply
+from .main_thread import MainThreadDispatcher
+from .osc_async_server import OscAsyncTcpServer
+from .osc_codec import encoded_size
+from .rate_limiter import RateLimiter
+from .reply_cache import ReplyCache
+from .router import OscRouter
+from .scheduler import CommandScheduler, LatencyStats
 from .service_announcer import QLabServiceAnnouncer
 from .settings import QlabMimicSettings
-from .utility import client_id_string, join_path, QlabStatus, split_path
+from .update_coalescer import UpdateCoalescer
+from .utility import (
+    client_id_string, CLIENT_BACKLOG_LIMIT, has_osc_pattern, join_path, MessageClass, QlabStatus)
 
 logger = logging.getLogger(__name__) # pylint: disable=invalid-name
 
 QLAB_VERSION = '4.3'
 QLAB_TCP_PORT = 53000
-MESSAGE_RECV_TIMEOUT = 0.1 # seconds
+UPDATE_COALESCE_WINDOW = 30 # milliseconds
+
+# The signals of a cue, one of which is emitted once a GO has started it
+GO_STARTED_SIGNALS = ('prewait_start', 'started')
+GO_LATENCY_TIMEOUT = 5 # seconds
+
+# 'liblo': uses (patched) pyliblo's ServerThread
+# 'asyncio': uses our own implementation, not requiring liblo
+OSC_TRANSPORTS = ('liblo', 'asyncio')
+DEFAULT_OSC_TRANSPORT = 'liblo'
 
 class QlabMimic(Plugin):
     """LiSP pretends to be QLab for the purposes of basic OSC control"""
@@ -58,18 +77,40 @@ class QlabMimic(Plugin):
 
         self._session_name = None
         self._session_uuid = None
-        self._connected_clients = {}
-        self._last_messages = {}
-
-        self._encoder = JSONEncoder(separators=(',', ':'))
+        self._update_prefix = None
+        self._clients = ClientRegistry(self._client_queue_depth, self._on_clients_reaping)
+        # (The window is set from the plugin's configuration)
+        self._duplicate_filter = DuplicateFilter(0)
+        # (As are the rate limits, whether to reply when they're exceeded, the client limit, and
+        # how long replies are shared for)
+        self._rate_limiter = RateLimiter()
+        self._reply_when_throttled = True
+        self._max_clients = 0
+        self._reply_cache = ReplyCache(0)
+
+        # Set whilst a session is being loaded
+        self._bulk_loading = False
+
+        # The signals of each cue for when it's edited are connected once a session has loaded
+        # (so that the snapshot of cues is kept up-to-date); those for when it changes state,
+        # only once a client asks to receive updates.
+        self._cue_signals_connected = False
+        self._cue_state_signals_connected = False
 
         self._cues_message_handler = CuesHandler(self)
+        self._router = self._build_router()
+        # Messages that change anything are handled in the main thread; queries are not
+        self._main_thread = MainThreadDispatcher()
+        self._scheduler = CommandScheduler(dispatcher=self._main_thread)
+        self._scheduler.start()
 
-        self._server = OscTcpServer(QLAB_TCP_PORT)
-        self._server.register_method(self._handle_always_reply, '/alwaysReply')
-        self._server.register_method(self._handle_workspaces, '/workspaces')
-        self._server.start()
-        self._server.new_message.connect(self._generic_handler)
+        # The time from a GO being received until the cue it started has started
+        self._go_latency = LatencyStats()
+        self._go_probe = None
+        self._update_coalescer = UpdateCoalescer(self.send_update)
+
+        self._server = None
+        self._server_transport = None
 
         self._server_announcer = QLabServiceAnnouncer(QLAB_TCP_PORT)
 
@@ -80,14 +121,61 @@ class QlabMimic(Plugin):
         self._actualize_config(self.Config)
 
     def _actualize_config(self, _):
+        transport = self.Config.get("osc_transport", DEFAULT_OSC_TRANSPORT)
+        if transport not in OSC_TRANSPORTS:
+            transport = DEFAULT_OSC_TRANSPORT
+        if transport != self._server_transport:
+            self._start_server(transport)
+
         if self.Config.get("service_announcement", True):
             self._server_announcer.start()
         else:
             self._server_announcer.stop()
 
+        self._duplicate_filter.window = self.Config.get("duplicate_message_window") / 1000
+        update_window = self.Config.get("update_coalesce_window", UPDATE_COALESCE_WINDOW) / 1000
+        self._update_coalescer.window = update_window
+        self._cues_message_handler.set_update_window(update_window)
+        self._server.backlog_limit = self.Config.get(
+            "client_backlog_limit", CLIENT_BACKLOG_LIMIT)
+        self._cues_message_handler.set_ticker_rate(
+            self.Config.get("elapsed_ticker_rate", 0))
+        self._clients.set_idle_timeout(self.Config.get("client_idle_timeout"))
+        self._max_clients = self.Config.get("max_clients")
+        for message_class in MessageClass:
+            self._rate_limiter.set_rate(message_class, self.Config.get(
+                f"rate_limit_{message_class.name.lower()}"))
+        self._reply_when_throttled = self.Config.get("rate_limit_reply")
+        self._reply_cache.ttl = self.Config.get("reply_cache_ttl") / 1000
+
+    def _start_server(self, transport):
+        if self._server is not None:
+            if self._session_uuid:
+                self._update_coalescer.flush()
+                self._emit_workspace_disconnect()
+            self._server.stop()
+            # Clients were connected to the previous server, and will need to reconnect
+            self._clients.clear()
+            self._duplicate_filter.clear()
+            self._rate_limiter.clear()
+
+        if transport == 'asyncio':
+            self._server = OscAsyncTcpServer(QLAB_TCP_PORT)
+        else:
+            # Imported here, so that liblo is only required if it's actually used
+            from .osc_tcp_server import OscTcpServer # pylint: disable=import-outside-toplevel
+            self._server = OscTcpServer(QLAB_TCP_PORT)
+
+        self._server.start()
+        self._server.new_message.connect(self._generic_handler)
+        self._server.client_evicted.connect(self._on_client_evicted)
+        self._server_transport = transport
+
     def _on_session_initialised(self, session):
         self._session_name = session.name()
         self._session_uuid = str(uuid4())
+        self._update_prefix = join_path(['update', 'workspace', self._session_uuid])
+        self._reply_cache.invalidate()
 
         self.app.cue_model.item_added.connect(self._on_cue_added)
         self.app.layout.model.item_moved.connect(self._on_cue_moved)
@@ -98,11 +186,46 @@ class QlabMimic(Plugin):
 
         self._cues_message_handler.register_cuelists(self.app.layout)
 
+        # When a session is loaded, its cues are added immediately after it's initialised. So as
+        # not to send (and process) updates about each cue, these are withheld until control
+        # returns to the event loop, and replaced by a single update about the entire workspace.
+        self._bulk_loading = True
+        self._cues_message_handler.begin_bulk_load()
+        QTimer.singleShot(0, self._end_bulk_load)
+
+    def _end_bulk_load(self):
+        if not self._bulk_loading:
+            # The session was closed before it finished loading
+            return
+
+        self._bulk_loading = False
+        self._cues_message_handler.end_bulk_load()
+        for cue in self.app.cue_model:
+            self._connect_cue(cue)
+        self._cue_signals_connected = True
+        if self._clients.subscribers('updates') or self._clients.subscribers('elapsed'):
+            self._connect_cue_state_signals()
+        self.emit_workspace_updated()
+
+    def _connect_cue_state_signals(self):
+        if self._cue_state_signals_connected or not self._cue_signals_connected:
+            return
+
+        for cue in self.app.cue_model:
+            self._connect_cue_state(cue)
+        self._cue_state_signals_connected = True
+        self._cues_message_handler.set_cue_tracking(True)
+
     def _pre_session_deinitialisation(self, _):
+        # Send any held updates whilst the session (and its uuid) still exists
+        self._update_coalescer.flush()
         self._emit_workspace_disconnect()
 
         self._session_name = None
         self._session_uuid = None
+        self._update_prefix = None
+        self._reply_cache.invalidate()
+        self._end_go_probe()
 
         self.app.cue_model.item_added.disconnect(self._on_cue_added)
         self.app.layout.model.item_moved.disconnect(self._on_cue_moved)
@@ -111,6 +234,13 @@ class QlabMimic(Plugin):
         if isinstance(self.app.layout, ListLayout):
             self.app.layout.view.listView.currentItemChanged.disconnect(self._emit_playback_head_updated)
 
+        if self._cue_signals_connected:
+            for cue in self.app.cue_model:
+                self._disconnect_cue(cue)
+            self._cue_signals_connected = False
+            self._cue_state_signals_connected = False
+        self._bulk_loading = False
+
         self._cues_message_handler.deregister_cuelists()
 
     @property
@@ -118,264 +248,447 @@ class QlabMimic(Plugin):
         return self._server
 
     def terminate(self):
+        self._cues_message_handler.terminate()
+        self._clients.stop()
+        self._update_coalescer.cancel()
         self._server.stop()
+        self._scheduler.stop()
 
     def finalize(self):
         logger.debug('Shutting down QLab server')
         self.terminate()
+        logger.debug(f'Duplicate message filter: {self._duplicate_filter.stats}')
+        logger.debug(f'Clients: {self._clients.stats}')
+        logger.debug(f'Rate limiting: {self._rate_limiter.stats}')
+        logger.debug(f'Reply cache: {self._reply_cache.stats}')
+        logger.debug(f'Message queue latency: {self._scheduler.stats}')
+        logger.debug(f'Message handling latency (main thread): {self._main_thread.stats}')
+        logger.debug(f'GO to cue start latency: {self._go_latency.as_dict()}')
         self._server_announcer.terminate()
 
-    def send_reply(self, src, path, status, data=None, send_id=True):
-        client_id = client_id_string(src)
-        if data is None and (client_id not in self._connected_clients or not self._connected_clients[client_id][2]):
+    def send_reply(self, src, path, status, data=None, send_id=True, generation=None, always_send=False):
+        client = self._clients.get(src)
+        if data is None and not always_send and (client is None or not client.always_reply):
             return
-        src.set_slip_enabled(SLIP_DOUBLE)
-        response = {
-            'address': path,
-            'status': status.value,
-        }
-        if send_id and self._session_uuid:
-            response['workspace_id'] = self._session_uuid
-        if status is QlabStatus.Ok and data is not None:
-            response['data'] = data
-        response = self._encoder.encode(response)
+        response = self._encode_reply(path, status, data, send_id, generation)
+        self._send_encoded_reply(src, client, path, response)
+
+    def _encode_reply(self, path, status, data, send_id=True, generation=None):
+        return encode_reply(
+            path,
+            status.value,
+            self._session_uuid if send_id and self._session_uuid else None,
+            data if status is QlabStatus.Ok else None,
+            generation if status is QlabStatus.Ok else None)
+
+    def _send_encoded_reply(self, src, client, path, response):
+        src.set_slip_enabled(self._server.SLIP_DOUBLE)
         self._server.send(src, '/reply' + path, response)
+        if client is not None:
+            self._clients.sent([client], encoded_size('/reply' + path, response))
+
+    def _reply_to_query(self, request, path, query):
+        '''Replies to a request, sharing the encoded reply with identical queries received shortly after.
+
+        `query` is called (if there's no reply to share) to get a tuple of the reply's status,
+        data, and generation.
 
-    def send_update(self, path, args=[], always_send=False):
-        path[0:0] = ['update', 'workspace', self._session_uuid]
-        path = join_path(path)
-        to_prune = []
-        for client_id, client in self._connected_clients.items():
-            if client[1] or always_send:
-                client[0].set_slip_enabled(SLIP_DOUBLE)
-                if not self._server.send(client[0], path, *args):
-                    to_prune.append(client_id)
-
-        for client_id in to_prune:
+        Only read-only requests are shared, and only whilst the state signals of cues are
+        connected, as otherwise there'd be no way of knowing when a reply has become stale.
+        Requests with arguments that can't be hashed (such as blobs) are never shared.
+        '''
+        key = None
+        if request.message_class is MessageClass.Query and self._cue_state_signals_connected:
+            key = (path, tuple(request.args), self._cues_message_handler.generation)
+            try:
+                hash(key)
+            except TypeError:
+                key = None
+
+        if key is None:
+            status, data, generation = query()
+            self.send_reply(request.src, path, status, data, generation=generation)
+            return
+
+        response = self._reply_cache.get(key)
+        if response is None:
+            epoch = self._reply_cache.epoch
+            status, data, generation = query()
+            if data is None:
+                # Whether such a reply is sent at all depends on the client
+                self.send_reply(request.src, path, status, generation=generation)
+                return
+            response = self._encode_reply(path, status, data, generation=generation)
+            self._reply_cache.put(key, response, epoch)
+
+        self._send_encoded_reply(request.src, self._clients.get(request.src), path, response)
+
+    def send_update(self, path, args=[], always_send=False, subscription='updates', clients=None):
+        '''Sends an update to those clients subscribed to it (or to the given client records).'''
+        if self._update_prefix is None:
+            # The session has since been closed
+            return
+        # The prefix is constant for the session, so is only built the once
+        path = self._update_prefix + join_path(path) if path else self._update_prefix
+        if clients is None:
+            clients = self._clients.subscribers(None if always_send else subscription)
+        if not clients:
+            return
+
+        recipients = []
+        for client in clients:
+            client.address.set_slip_enabled(self._server.SLIP_DOUBLE)
+            recipients.append(client.address)
+
+        # The message is encoded once, then shared between all recipients
+        for address in self._server.broadcast(recipients, path, *args):
+            client_id = client_id_string(address)
             logger.debug(f"Unable to update client at '{client_id}'. Removing from list of connected clients.")
-            del self._connected_clients[client_id]
+            self._clients.remove(address)
+        self._clients.sent(clients, encoded_size(path, *args))
+
+    def _client_queue_depth(self, address):
+        return self._server.queue_depth(address)
+
+    def _on_client_evicted(self, address):
+        if self._clients.remove(address) is not None:
+            logger.debug(
+                f"Removed evicted client at '{client_id_string(address)}' from list of connected clients.")
+
+    def _on_clients_reaping(self, clients):
+        for client in clients:
+            logger.debug(
+                f"Client at '{client_id_string(client.address)}' not heard from recently. "
+                f"Removing from list of connected clients.")
+        # Told to disconnect, so that (should it still be there) it knows to reconnect
+        self.send_update(['disconnect'], clients=clients)
+
+    def _build_router(self):
+        transport = MessageClass.Transport
+        change = MessageClass.Set
+        query = MessageClass.Query
+
+        def set_if_args(request):
+            return change if request.args else query
+
+        router = OscRouter()
+        router.add('/alwaysReply', self._handle_always_reply, change)
+        router.add('/workspaces', self._handle_workspaces, query)
+
+        router.add('/cue/{cue_number}/{property_path+}', self._handle_cue, cue_message_class)
+        router.add('/cue_id/{cue_id}/{property_path+}', self._handle_cue, cue_message_class)
+        router.add('/disconnect', self._handle_disconnect, change)
+        router.add('/go', self._handle_go, transport)
+        router.add('/stop', self._handle_stop, transport)
+        router.add('/updates', self._handle_updates, change)
+        router.add('/version', self._handle_version, query)
+
+        workspace_routes = {
+            'connect': (self._handle_connect, change),
+            'cue/{cue_number}/{property_path+}': (self._handle_cue, cue_message_class),
+            'cue_id/{cue_id}/{property_path+}': (self._handle_cue, cue_message_class),
+            'cueLists': (self._handle_cuelists, query),
+            'cueLists/shallow': (self._handle_cuelists_shallow, query),
+            'cues/valuesForKeys': (self._handle_cues_values_for_keys, query),
+            'disconnect': (self._handle_disconnect, change),
+            'doubleGoWindowRemaining': (self._handle_doubleGoWindowRemaining, query),
+            'go': (self._handle_go, transport),
+            'panic': (self._handle_panic, transport),
+            'pause': (self._handle_pause, transport),
+            'resume': (self._handle_resume, transport),
+            'runningCues': (self._handle_runningCues, query),
+            'runningOrPausedCues': (self._handle_runningOrPausedCues, query),
+            'select/{action}': (self._handle_select, change),
+            'select_id/{cue_id}': (self._handle_selectId, change),
+            'selectionIsPlayhead': (self._handle_selectionIsPlayhead, set_if_args),
+            'showMode': (self._handle_showMode, set_if_args),
+            'stop': (self._handle_stop, transport),
+            'thump': (self._handle_thump, query),
+            'updates': (self._handle_updates, change),
+            'updates/elapsed': (self._handle_elapsed_updates, change),
+        }
+        for pattern, (handler, message_class) in workspace_routes.items():
+            router.add('/workspace/{workspace_id}/' + pattern, handler, message_class)
+
+        return router
 
     def _generic_handler(self, original_path, args, types, src, user_data):
-        if (src.url in self._last_messages
-            and original_path == self._last_messages[src.url][0]
-            and time.time() < self._last_messages[src.url][1] + MESSAGE_RECV_TIMEOUT
-        ):
+        if self._duplicate_filter.is_duplicate(src.url, original_path):
             logger.debug(
                 f"Duplicate message received too soon after the last, ignoring. "\
                 f"({src.hostname} :: {original_path})"
             )
             return
 
-        self._last_messages[src.url] = [original_path, time.time()]
-        path = split_path(original_path)
-
-        handlers = {
-            'cue': self._handle_cue,
-            'cue_id': self._handle_cue,
-            'disconnect': self._handle_disconnect,
-            'go': self._handle_go,
-            'stop': self._handle_stop,
-            'updates': self._handle_updates,
-            'version': self._handle_version,
-            'workspace': self._handle_workspace,
-        }
+        # Any message from a client (`/thump`, or otherwise) shows that it's still there
+        self._clients.seen(src)
 
-        if path[0] not in handlers:
+        handler, request = self._router.route(original_path, args, types, src)
+        if handler is None:
             self.send_reply(src, original_path, QlabStatus.NotOk)
             return
 
-        handlers.get(
-            path[0], lambda *_: None
-        )(
-            original_path, args, types, src, user_data
-        )
+         # If wrong workspace
+        if request.workspace_id is not None and request.workspace_id not in (self._session_uuid, self._session_name):
+            self.send_reply(src, original_path, QlabStatus.NotOk, send_id=False)
+            return
 
-    def _handle_always_reply(self, original_path, args, types, src, user_data):
-        client_id = client_id_string(src)
-        if client_id not in self._connected_clients:
+        client = self._clients.get(src)
+        buckets = client.buckets if client is not None else None
+        if not self._rate_limiter.allow(src.url, buckets, request.message_class):
+            if client is not None:
+                client.throttled += 1
+            logger.debug(
+                f"Message received too soon after too many others, ignoring. "\
+                f"({src.hostname} :: {original_path})"
+            )
+            if self._reply_when_throttled:
+                self.send_reply(src, original_path, QlabStatus.NotOk, always_send=True)
+            return
+
+        self._scheduler.submit(request.message_class, handler, request)
+
+    def _handle_always_reply(self, request):
+        client = self._clients.get(request.src)
+        if client is None:
             # No point in sending a reply, as we don't recognise the client
             return
-        self._connected_clients[client_id][2] = bool(args[0])
-        self.send_reply(src, original_path, QlabStatus.Ok)
-
-    def _handle_connect(self, original_path, args, types, src, user_data):
-        client_id = client_id_string(src)
-        if client_id not in self._connected_clients:
-            self._connected_clients[client_id] = [src, False, False]
-        self.send_reply(src, original_path, QlabStatus.Ok, 'ok')
-
-    def _handle_cue(self, original_path, args, types, src, user_data):
-        path = split_path(original_path)
-        if path[0] == 'workspace':
-            del path[0:2]
-        return_path = join_path(path)
-        if path[0] == 'cue':
-            status, data = self._cues_message_handler.by_cue_number(path, args, self.app.layout)
+        client.always_reply = bool(request.args[0])
+        self.send_reply(request.src, request.path, QlabStatus.Ok)
+
+    def _handle_connect(self, request):
+        if request.src not in self._clients and self._max_clients and len(self._clients) >= self._max_clients:
+            logger.warning(
+                f"Refused connection from '{client_id_string(request.src)}': "
+                f"{self._max_clients} clients are already connected.")
+            self.send_reply(request.src, request.path, QlabStatus.NotOk, always_send=True)
+            return
+        self._clients.connect(request.src)
+        self.send_reply(request.src, request.path, QlabStatus.Ok, 'ok')
+
+    def _handle_cue(self, request):
+        self._reply_to_query(request, request.local_path, lambda: self._query_cue(request))
+
+    def _query_cue(self, request):
+        path = list(request.property_path)
+        generation = None
+        if request.cue_number is not None:
+            if has_osc_pattern(request.cue_number):
+                status, data = self._cues_message_handler.by_cue_number_pattern(
+                    request.cue_number, path, request.args)
+            else:
+                if path == ['children']:
+                    generation = self._cues_message_handler.children_generation(
+                        cue_number=request.cue_number)
+                status, data = self._cues_message_handler.by_cue_number(
+                    request.cue_number, path, request.args)
         else:
-            status, data = self._cues_message_handler.by_cue_id(path, args, self.app.cue_model)
-        self.send_reply(src, return_path, status, data)
-
-    def _handle_cuelists(self, path, args, types, src, user_data):
-         cuelists = self._cues_message_handler.get_cuelists()
-         self.send_reply(src, path, QlabStatus.Ok, cuelists)
-
-    def _handle_disconnect(self, original_path, args, types, src, user_data):
-        client_id = client_id_string(src)
-        if client_id in self._connected_clients:
-            self.send_reply(src, original_path, QlabStatus.Ok)
-            del self._connected_clients[client_id]
+            if has_osc_pattern(request.cue_id):
+                status, data = self._cues_message_handler.by_cue_id_pattern(
+                    request.cue_id, path, request.args)
+            else:
+                if path == ['children']:
+                    generation = self._cues_message_handler.children_generation(
+                        cue_id=request.cue_id)
+                status, data = self._cues_message_handler.by_cue_id(
+                    request.cue_id, path, request.args)
+        return status, data, generation
+
+    def _handle_cuelists(self, request):
+        '''
+        /workspace/<id>/cueLists [<generation>]
+
+        If a generation (as included with a previous reply) is given, the reply contains only
+        what has changed since.
+        '''
+        def query():
+            # Taken first, so that a change made whilst replying is not missed by the client
+            generation = self._cues_message_handler.generation
+            if request.args:
+                status, cuelists = self._cues_message_handler.get_cuelists_since(request.args[0])
+            else:
+                status, cuelists = QlabStatus.Ok, self._cues_message_handler.get_cuelists()
+            return status, cuelists, generation
+        self._reply_to_query(request, request.path, query)
+
+    def _handle_cuelists_shallow(self, request):
+        self._reply_to_query(request, request.path, lambda: (
+            QlabStatus.Ok, self._cues_message_handler.get_cuelists(shallow=True), None))
+
+    def _handle_cues_values_for_keys(self, request):
+        '''
+        /workspace/<id>/cues/valuesForKeys
+
+        Not part of QLab's OSC API; allows the state of many cues to be requested at once.
+        '''
+        self._reply_to_query(request, request.path, lambda: (
+            *self._cues_message_handler.values_for_keys_bulk(request.args), None))
+
+    def _handle_disconnect(self, request):
+        if request.src in self._clients:
+            self.send_reply(request.src, request.path, QlabStatus.Ok)
+            self._clients.remove(request.src)
         else:
-            logger.warn(client_id + " not recognised (disconnect)")
+            logger.warn(client_id_string(request.src) + " not recognised (disconnect)")
 
-    def _handle_doubleGoWindowRemaining(self, path, args, types, src, user_data):
-        self.send_reply(src, path, QlabStatus.Ok, 0)
+    def _handle_doubleGoWindowRemaining(self, request):
+        self.send_reply(request.src, request.path, QlabStatus.Ok, 0)
 
-    def _handle_go(self, path, args, types, src, user_data):
+    def _handle_go(self, request):
+        self._probe_go(request)
         self.app.layout.go()
-        self.send_reply(src, path, QlabStatus.Ok)
+        self.send_reply(request.src, request.path, QlabStatus.Ok)
+
+    def _probe_go(self, request):
+        '''Watches the cue a GO is about to start, so as to measure how long it takes to start.'''
+        self._end_go_probe()
+        if not isinstance(self.app.layout, ListLayout):
+            return
+        cue = self.app.layout.standby_cue()
+        if cue is None:
+            return
+        self._go_probe = (cue, request.received_at)
+        for signal in GO_STARTED_SIGNALS:
+            getattr(cue, signal).connect(self._on_go_started)
 
-    def _handle_panic(self, path, args, types, src, user_data):
+    def _end_go_probe(self):
+        if self._go_probe is None:
+            return
+        cue = self._go_probe[0]
+        for signal in GO_STARTED_SIGNALS:
+            getattr(cue, signal).disconnect(self._on_go_started)
+        self._go_probe = None
+
+    def _on_go_started(self, cue):
+        # Called from the thread the cue is started in. The probe is left connected (until the
+        # next GO) rather than disconnected from within the signal being emitted.
+        probe = self._go_probe
+        if probe is None or probe[0] is not cue or probe[1] is None:
+            return
+        latency = monotonic() - probe[1]
+        self._go_probe = (cue, None)
+        if latency < GO_LATENCY_TIMEOUT:
+            self._go_latency.record(latency)
+
+    def _handle_panic(self, request):
         self.app.layout.interrupt_all()
-        self.send_reply(src, path, QlabStatus.Ok)
+        self.send_reply(request.src, request.path, QlabStatus.Ok)
 
-    def _handle_pause(self, path, args, types, src, user_data):
+    def _handle_pause(self, request):
         self.app.layout.pause_all()
-        self.send_reply(src, path, QlabStatus.Ok)
+        self.send_reply(request.src, request.path, QlabStatus.Ok)
 
-    def _handle_resume(self, path, args, types, src, user_data):
+    def _handle_resume(self, request):
         self.app.layout.resume_all()
-        self.send_reply(src, path, QlabStatus.Ok)
+        self.send_reply(request.src, request.path, QlabStatus.Ok)
 
-    def _handle_runningCues(self, path, args, types, src, user_data):
-        self._cues_message_handler.get_currently_playing(False)
-        self.send_reply(src, path, QlabStatus.Ok, cues)
+    def _handle_runningCues(self, request):
+        self._reply_to_query(request, request.path, lambda: (
+            QlabStatus.Ok, self._cues_message_handler.get_currently_playing(False), None))
 
-    def _handle_runningOrPausedCues(self, path, args, types, src, user_data):
-        cues = self._cues_message_handler.get_currently_playing(True)
-        self.send_reply(src, path, QlabStatus.Ok, cues)
+    def _handle_runningOrPausedCues(self, request):
+        self._reply_to_query(request, request.path, lambda: (
+            QlabStatus.Ok, self._cues_message_handler.get_currently_playing(True), None))
 
-    def _handle_select(self, path, args, types, src, user_data):
+    def _handle_select(self, request):
         '''
         /workspace/<id>/select/{previous|next}
         '''
         if not isinstance(self.app.layout, ListLayout):
-            self.send_reply(src, path, QlabStatus.NotOk)
+            self.send_reply(request.src, request.path, QlabStatus.NotOk)
             return
 
-        action = split_path(path)[3]
         actions = {
             'next': lambda current: current + 1,
             'previous': lambda current: current - 1,
         }
 
-        if action not in actions:
-            self.send_reply(src, path, QlabStatus.NotOk)
+        if request.action not in actions:
+            self.send_reply(request.src, request.path, QlabStatus.NotOk)
             return
 
         self.app.layout.set_standby_index(
-            actions.get(action)(self.app.layout.standby_index())
+            actions.get(request.action)(self.app.layout.standby_index())
         )
-        self.send_reply(src, path, QlabStatus.Ok)
+        self.send_reply(request.src, request.path, QlabStatus.Ok)
 
-    def _handle_selectId(self, path, args, types, src, user_data):
+    def _handle_selectId(self, request):
         '''
         /workspace/<id>/select_id/<cue_id>
         '''
         if not isinstance(self.app.layout, ListLayout):
-            self.send_reply(src, path, QlabStatus.NotOk)
+            self.send_reply(request.src, request.path, QlabStatus.NotOk)
             return
 
-        cue_id = split_path(path)[3]
-        cue = self.app.layout.cue_model.get(cue_id)
+        cue = self.app.layout.cue_model.get(request.cue_id)
         if cue is None or cue.index < 0:
-            self.send_reply(src, path, QlabStatus.NotOk)
+            self.send_reply(request.src, request.path, QlabStatus.NotOk)
             return
 
         self.app.layout.set_standby_index(cue.index)
-        self.send_reply(src, path, QlabStatus.Ok)
+        self.send_reply(request.src, request.path, QlabStatus.Ok)
 
-    def _handle_selectionIsPlayhead(self, path, args, types, src, user_data):
+    def _handle_selectionIsPlayhead(self, request):
         if isinstance(self.app.layout, ListLayout):
-            if args:
-                self.app.layout.selection_mode = not bool(args[0])
-                self.send_reply(src, path, QlabStatus.Ok)
+            if request.args:
+                self.app.layout.selection_mode = not bool(request.args[0])
+                self.send_reply(request.src, request.path, QlabStatus.Ok)
             else:
-                self.send_reply(src, path, QlabStatus.Ok, int(not self.app.layout.selection_mode))
+                self.send_reply(request.src, request.path, QlabStatus.Ok, int(not self.app.layout.selection_mode))
 
         else:
-            if args:
-                self.send_reply(src, path, QlabStatus.NotOk)
+            if request.args:
+                self.send_reply(request.src, request.path, QlabStatus.NotOk)
             else:
-                self.send_reply(src, path, QlabStatus.Ok, 0)
+                self.send_reply(request.src, request.path, QlabStatus.Ok, 0)
 
-    def _handle_showMode(self, path, args, types, src, user_data):
-        if args:
+    def _handle_showMode(self, request):
+        if request.args:
             # We don't support changing this setting
-            self.send_reply(src, path, QlabStatus.NotOk)
+            self.send_reply(request.src, request.path, QlabStatus.NotOk)
         else:
-            self.send_reply(src, path, QlabStatus.Ok, 1)
+            self.send_reply(request.src, request.path, QlabStatus.Ok, 1)
 
-    def _handle_stop(self, path, args, types, src, user_data):
+    def _handle_stop(self, request):
         self.app.layout.stop_all()
-        self.send_reply(src, path, QlabStatus.Ok)
+        self.send_reply(request.src, request.path, QlabStatus.Ok)
 
-    def _handle_thump(self, path, args, types, src, user_data):
-        self.send_reply(src, path, QlabStatus.Ok, 'thump')
+    def _handle_thump(self, request):
+        self.send_reply(request.src, request.path, QlabStatus.Ok, 'thump')
 
-    def _handle_updates(self, original_path, args, types, src, user_data):
-        client_id = client_id_string(src)
-        if client_id not in self._connected_clients:
+    def _handle_updates(self, request):
+        client = self._clients.get(request.src)
+        if client is None:
             # No point in sending a reply, as we don't recognise the client
             return
-        self._connected_clients[client_id][1] = bool(args[0])
-        self.send_reply(src, original_path, QlabStatus.Ok)
-
-    def _handle_version(self, original_path, args, types, src, user_data):
-        self.send_reply(src, original_path, QlabStatus.Ok, QLAB_VERSION)
-
-    def _handle_workspace(self, original_path, args, types, src, user_data):
-        path = split_path(original_path)
-
-         # If wrong workspace
-        if path[1] != self._session_uuid and path[1] != self._session_name:
-            self.send_reply(src, original_path, QlabStatus.NotOk, send_id=False)
+        if not request.args:
+            self.send_reply(request.src, request.path, QlabStatus.NotOk)
             return
-
-        handlers = {
-            'connect': self._handle_connect,
-            'cue': self._handle_cue,
-            'cue_id': self._handle_cue,
-            'cueLists': self._handle_cuelists,
-            'disconnect': self._handle_disconnect,
-            'doubleGoWindowRemaining': self._handle_doubleGoWindowRemaining,
-            'go': self._handle_go,
-            'panic': self._handle_panic,
-            'pause': self._handle_pause,
-            'resume': self._handle_resume,
-            'runningCues': self._handle_runningCues,
-            'runningOrPausedCues': self._handle_runningOrPausedCues,
-            'select': self._handle_select,
-            'select_id': self._handle_selectId,
-            'selectionIsPlayhead': self._handle_selectionIsPlayhead,
-            'showMode': self._handle_showMode,
-            'stop': self._handle_stop,
-            'thump': self._handle_thump,
-            'updates': self._handle_updates,
-        }
-
-        if path[2] not in handlers:
-            self.send_reply(src, original_path, QlabStatus.NotOk)
+        client.updates = bool(request.args[0])
+        if request.args[0]:
+            self._connect_cue_state_signals()
+        self.send_reply(request.src, request.path, QlabStatus.Ok)
+
+    def _handle_elapsed_updates(self, request):
+        client = self._clients.get(request.src)
+        if client is None:
+            # No point in sending a reply, as we don't recognise the client
+            return
+        if not request.args:
+            self.send_reply(request.src, request.path, QlabStatus.NotOk)
             return
+        client.elapsed = bool(request.args[0])
+        if request.args[0]:
+            # Running cues are then tracked from their signals, rather than found on each sample
+            self._connect_cue_state_signals()
+        self.send_reply(request.src, request.path, QlabStatus.Ok)
 
-        handlers.get(
-            path[2], lambda *_: None
-        )(
-            original_path, args, types, src, user_data
-        )
+    def _handle_version(self, request):
+        self.send_reply(request.src, request.path, QlabStatus.Ok, QLAB_VERSION)
 
-    def _handle_workspaces(self, path, args, types, src, user_data):
+    def _handle_workspaces(self, request):
         if not self._session_uuid:
-            self.send_reply(src, path, QlabStatus.NotOk, send_id=False)
+            self.send_reply(request.src, request.path, QlabStatus.NotOk, send_id=False)
             return
 
         workspaces = [{
@@ -385,49 +698,82 @@ class QlabMimic(Plugin):
             'version': QLAB_VERSION,
         }]
 
-        self.send_reply(src, path, QlabStatus.Ok, workspaces, send_id=False)
+        self.send_reply(request.src, request.path, QlabStatus.Ok, workspaces, send_id=False)
 
     def _on_cue_added(self, cue):
-        self.emit_workspace_updated()
+        # The cue's parent is announced as updated once the change journal is next flushed
+        self._cues_message_handler.cue_added(cue)
+        self._reply_cache.invalidate()
+        if self._cue_signals_connected:
+            self._connect_cue(cue)
 
-        # Emit that the parent cue has been changed
-        self.emit_cue_updated(self._cues_message_handler.cue_parent(cue))
+    def _on_cue_removed(self, cue):
+        self._cues_message_handler.cue_removed(cue)
+        self._reply_cache.invalidate()
+        if self._cue_signals_connected:
+            self._disconnect_cue(cue)
 
+    def _connect_cue(self, cue):
         # Set listeners for when a cue has been edited...
-        cue.properties_changed.connect(self.emit_cue_updated)
+        cue.properties_changed.connect(self._on_cue_changed)
+        # ...and (if wanted) when it changes state
+        if self._cue_state_signals_connected:
+            self._connect_cue_state(cue)
+
+    def _disconnect_cue(self, cue):
+        # Remove listeners for when a cue has been edited...
+        cue.properties_changed.disconnect(self._on_cue_changed)
         # ...and when it changes state
+        if self._cue_state_signals_connected:
+            self._disconnect_cue_state(cue)
+
+    def _connect_cue_state(self, cue):
         for state_change in CUE_STATE_CHANGES:
-            cue.__getattribute__(state_change).connect(self.emit_cue_updated)
+            cue.__getattribute__(state_change).connect(self._on_cue_state_changed)
 
-    def _on_cue_removed(self, cue):
-        self.emit_workspace_updated()
+    def _disconnect_cue_state(self, cue):
+        for state_change in CUE_STATE_CHANGES:
+            cue.__getattribute__(state_change).disconnect(self._on_cue_state_changed)
 
-        # Emit that the parent cue has been changed
-        self.emit_cue_updated(self._cues_message_handler.cue_parent(cue))
+    def _on_cue_changed(self, cue):
+        self._cues_message_handler.cue_changed(cue)
+        self._reply_cache.invalidate()
+        self.emit_cue_updated(cue)
 
-        # Remove listeners for when a cue has been edited...
-        cue.properties_changed.disconnect(self.emit_cue_updated)
-        # ...and when it changes state
-        for state_change in CUE_STATE_CHANGES:
-            cue.__getattribute__(state_change).disconnect(self.emit_cue_updated)
+    def _on_cue_state_changed(self, cue):
+        self._cues_message_handler.cue_state_changed(cue)
+        self._reply_cache.invalidate()
+        self.emit_cue_updated(cue)
 
-    def _on_cue_moved(self, old_index, new_index):
+    def _on_cue_moved(self, _, new_index):
         cue = self.app.layout.model.item(new_index)
+        # Both the old and (if different) new parents are announced as updated
+        self._cues_message_handler.cue_moved(cue)
+        self._reply_cache.invalidate()
 
-        self.emit_workspace_updated()
+    def emit_cue_updated(self, cue, coalesce=True):
+        '''Sent if the cue or its state has changed
 
-        # Emit that the parent cue(s) have been changed
-        self.emit_cue_updated(self._cues_message_handler.cue_parent(cue))
-        if not isinstance(self.app.layout, ListLayout):
-            # In case cue has been moved from one page to another
-            old_page_num = self.app.layout.to_3d_index(old_index)[0]
-            new_page_num = self.app.layout.to_3d_index(new_index)[0]
-            if old_page_num != new_page_num:
-                self.emit_cue_updated(self._cues_message_handler.cuelist(old_page_num))
+        Updates are held briefly so that repeats may be merged, unless `coalesce` is `False`.
+        '''
+        if coalesce:
+            self._update_coalescer.push(['cue_id', cue.id])
+        else:
+            self.send_update(['cue_id', cue.id])
 
-    def emit_cue_updated(self, cue):
-        '''Sent if the cue or its state has changed'''
-        self.send_update(['cue_id', cue.id])
+    def emit_elapsed_updated(self, samples):
+        '''Sent (to subscribed clients only) each time the elapsed times of running cues are sampled
+
+        The single argument is a JSON object, mapping the id of each running cue to a list of its
+        elapsed action, pre-wait, and post-wait times (in seconds).
+        '''
+        if not self._session_uuid:
+            return
+        data = {
+            cue_id: [round(elapsed / 1000, 3) for elapsed in sample]
+            for cue_id, sample in samples.items()
+        }
+        self.send_update(['elapsed'], [encode_json(data)], subscription='elapsed')
 
     def _emit_workspace_disconnect(self):
         '''Sent to tell clients that they need to disconnect
@@ -436,17 +782,21 @@ class QlabMimic(Plugin):
         '''
         self.send_update(['disconnect'], always_send=True)
 
-    def emit_workspace_updated(self, *_):
+    def emit_workspace_updated(self, *_, coalesce=True):
         '''Sent if the cue lists for the workspace need reloading
 
         For instance when a cue is added, removed, or other aspects of a workspace are updated.
+        Updates are held briefly so that repeats may be merged, unless `coalesce` is `False`.
         '''
-        self.send_update([])
+        if coalesce:
+            self._update_coalescer.push([])
+        else:
+            self.send_update([])
 
     def _emit_playback_head_updated(self, selected, _):
         '''Sent if the the selected cue has changed'''
-        cuelists = self._cues_message_handler.get_cuelists()
-        self.send_update(
-            ['cueList', cuelists[0]['uniqueID'], 'playbackPosition'],
+        self._reply_cache.invalidate()
+        self._update_coalescer.push(
+            ['cueList', self._cues_message_handler.cuelist(0).id, 'playbackPosition'],
             [selected.cue.id] if selected else []
         )
@@ -0,0 +1,156 @@
+# This file is a derivation of work on - and as such shares the same
+# licence as - Linux Show Player
+#
+# Linux Show Player:
+#   Copyright 2012-2022 Francesco Ceruti <ceppofrancy@gmail.com>
+#
+# This file:
+#   Copyright 2022 s0600204
+#
+# Linux Show Player is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Linux Show Player is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+A misbehaving remote (or a buggy script) can send requests far faster than any person could, and
+each one is handled on the show machine - often whilst audio is playing. So each client is allowed
+only so many messages per second of each class (transport, set, and query), as measured by a
+token bucket: a bucket holds up to a second's worth of tokens, is refilled at the permitted rate,
+and each message takes a token. Once a client's bucket is empty, its messages of that class are
+refused until it has refilled.
+
+Clients that have yet to connect to the workspace have no record to keep their buckets in, so
+they're kept here, keyed by client. As with the duplicate filter, clients come and go from new
+(ephemeral) ports, so these are dropped once idle long enough for their buckets to have refilled
+(at which point they'd be no different to new ones), and the least recently used are dropped
+should there still be too many.
+
+No limits are set by default: they're for those who need them to opt in to.
+"""
+
+from collections import OrderedDict
+from time import monotonic
+
+from .utility import MessageClass
+
+ANONYMOUS_BUCKETS_TTL = 1 # seconds, within which a bucket refills
+ANONYMOUS_BUCKETS_CAPACITY = 1024 # clients
+
+
+class TokenBucket:
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate # tokens per second
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now):
+        '''Takes a token, returning whether there was one to take.'''
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class RateLimiter:
+    '''Limits the rate at which each client may send each class of message.
+
+    Not thread-safe: to be called from the OSC server's thread only.
+    '''
+
+    def __init__(self, capacity=ANONYMOUS_BUCKETS_CAPACITY):
+        self._rates = {} # message class -> messages per second
+        self._capacity = capacity
+
+        # client -> (buckets, time last used) of clients not yet connected. As entries are
+        # (re)inserted at the end as they're used, they're ordered from least to most recent.
+        self._anonymous = OrderedDict()
+
+        self.allowed = {message_class: 0 for message_class in MessageClass}
+        self.throttled = {message_class: 0 for message_class in MessageClass}
+        self.expired = 0
+        self.evicted = 0
+
+    @property
+    def stats(self):
+        stats = {
+            message_class.name: {
+                'allowed': self.allowed[message_class],
+                'throttled': self.throttled[message_class],
+            } for message_class in MessageClass
+        }
+        stats['anonymous'] = {
+            'entries': len(self._anonymous),
+            'expired': self.expired,
+            'evicted': self.evicted,
+        }
+        return stats
+
+    def set_rate(self, message_class, rate):
+        '''Sets the messages per second permitted of a class. `0` removes the limit.'''
+        if rate > 0:
+            self._rates[message_class] = rate
+        else:
+            self._rates.pop(message_class, None)
+
+    def allow(self, client, buckets, message_class):
+        '''Returns whether a message may be handled, taking a token from the appropriate bucket.
+
+        `buckets` is the dict of a client's buckets, or `None` for a client not yet connected (in
+        which case those kept for `client` are used).
+        '''
+        rate = self._rates.get(message_class)
+        if rate is None:
+            self.allowed[message_class] += 1
+            return True
+
+        now = monotonic()
+        if buckets is None:
+            buckets = self._anonymous_buckets(client, now)
+
+        bucket = buckets.get(message_class)
+        if bucket is None or bucket.rate != rate:
+            # (Re)created should the rate have been reconfigured
+            bucket = buckets[message_class] = TokenBucket(rate, max(rate, 1), now)
+
+        if bucket.take(now):
+            self.allowed[message_class] += 1
+            return True
+        self.throttled[message_class] += 1
+        return False
+
+    def _anonymous_buckets(self, client, now):
+        anonymous = self._anonymous
+        expiry = now - ANONYMOUS_BUCKETS_TTL
+        while anonymous:
+            key = next(iter(anonymous))
+            if anonymous[key][1] > expiry:
+                break
+            del anonymous[key]
+            self.expired += 1
+
+        entry = anonymous.pop(client, None)
+        buckets = entry[0] if entry is not None else {}
+        anonymous[client] = (buckets, now)
+        if len(anonymous) > self._capacity:
+            anonymous.popitem(last=False)
+            self.evicted += 1
+        return buckets
+
+    def clear(self):
+        self._anonymous.clear()
@@ -0,0 +1,122 @@
+# This file is a derivation of work on - and as such shares the same
+# licence as - Linux Show Player
+#
+# Linux Show Player:
+#   Copyright 2012-2022 Francesco Ceruti <ceppofrancy@gmail.com>
+#
+# This file:
+#   Copyright 2022 s0600204
+#
+# Linux Show Player is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Linux Show Player is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Several remotes kept in sync with the workspace will, upon being told something has changed, each
+send the same requests within a few milliseconds of one another. Each would ordinarily be answered
+by gathering (and encoding) the same data again.
+
+Instead, once encoded, a reply to a query is kept for a short while, and sent in answer to any
+identical query (to the same path, with the same arguments, at the same workspace generation)
+received meanwhile. Replies are discarded as soon as anything about the workspace or its cues
+changes, so the time they're kept for only matters for those values (such as elapsed times) that
+change without notice.
+"""
+
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+REPLY_CACHE_CAPACITY = 256 # replies
+
+
+class ReplyCache:
+    '''Encoded replies, shared between identical queries received within a short time.'''
+
+    def __init__(self, ttl, capacity=REPLY_CACHE_CAPACITY):
+        self.ttl = ttl # seconds
+        self._capacity = capacity
+        self._lock = Lock()
+
+        # key -> (time stored, reply). Ordered from oldest to most recently stored.
+        self._replies = OrderedDict()
+
+        # Incremented each time the cache is invalidated, so that a reply gathered beforehand
+        # is not then stored
+        self._epoch = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._replies)
+
+    @property
+    def epoch(self):
+        return self._epoch
+
+    @property
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._replies),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0,
+            'invalidations': self.invalidations,
+        }
+
+    def get(self, key):
+        '''Returns the reply stored against a key, or `None` if there isn't one (or it has expired).'''
+        if not self.ttl:
+            return None
+
+        with self._lock:
+            entry = self._replies.get(key)
+            if entry is not None and monotonic() - entry[0] < self.ttl:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, key, reply, epoch):
+        '''Stores a reply, unless the cache has been invalidated since `epoch` was read.'''
+        if not self.ttl:
+            return
+
+        now = monotonic()
+        with self._lock:
+            if epoch != self._epoch:
+                return
+            self._prune(now)
+            self._replies[key] = (now, reply)
+            self._replies.move_to_end(key)
+            if len(self._replies) > self._capacity:
+                self._replies.popitem(last=False)
+
+    def _prune(self, now):
+        replies = self._replies
+        expiry = now - self.ttl
+        while replies:
+            key = next(iter(replies))
+            if replies[key][0] > expiry:
+                break
+            del replies[key]
+
+    def invalidate(self, *_):
+        with self._lock:
+            self._epoch += 1
+            if self._replies:
+                self._replies.clear()
+                self.invalidations += 1
@@ -0,0 +1,174 @@
+# This file is a derivation of work on - and as such shares the same
+# licence as - Linux Show Player
+#
+# Linux Show Player:
+#   Copyright 2012-2022 Francesco Ceruti <ceppofrancy@gmail.com>
+#
+# This file:
+#   Copyright 2022 s0600204
+#
+# Linux Show Player is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Linux Show Player is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Routing of incoming OSC messages to the methods that handle them.
+
+The routes are compiled, once, into a tree keyed on path segments. Segments of a route's pattern
+may be literal, or may capture the corresponding segment of an incoming path:
+
+* `{name}` captures a single segment;
+* `{name+}` captures all remaining segments (of which there must be at least one).
+
+Each incoming message is parsed once into an `OscRequest`, which holds any captured values and is
+passed on to the route's handler.
+
+Each route also declares the `MessageClass` of the messages it handles, either directly or as a
+function of the request.
+"""
+
+from time import monotonic
+
+from .utility import MessageClass, split_path
+
+WORKSPACE_PREFIX = '/workspace/'
+
+
+class OscRequest:
+    '''A single incoming message, and the values captured from its path.'''
+
+    # The names of the captures that may be used in patterns
+    CAPTURES = ('workspace_id', 'cue_number', 'cue_id', 'action', 'property_path')
+
+    __slots__ = ('path', 'args', 'types', 'src', 'received_at', 'message_class') + CAPTURES
+
+    def __init__(self, path, args, types, src):
+        self.path = path
+        self.args = args
+        self.types = types
+        self.src = src
+        self.received_at = monotonic()
+        self.message_class = MessageClass.Query
+        self.workspace_id = None
+        self.cue_number = None
+        self.cue_id = None
+        self.action = None
+        self.property_path = ()
+
+    @property
+    def local_path(self):
+        '''The path, without any `/workspace/<id>` prefix.'''
+        if self.workspace_id is None:
+            return self.path
+        return self.path[len(WORKSPACE_PREFIX) + len(self.workspace_id):]
+
+
+class RouteNode:
+
+    __slots__ = ('literals', 'capture', 'capture_name', 'remainder', 'remainder_name', 'handler')
+
+    def __init__(self):
+        self.literals = {}
+        self.capture = None
+        self.capture_name = None
+        self.remainder = None
+        self.remainder_name = None
+        self.handler = None
+
+
+class OscRouter:
+
+    def __init__(self):
+        self._root = RouteNode()
+
+    def add(self, pattern, handler, message_class=MessageClass.Query):
+        '''Adds a route.
+
+        `message_class` may be a `MessageClass`, or a function returning one given the request.
+        '''
+        handler = (handler, message_class)
+        node = self._root
+        segments = split_path(pattern)
+        for position, segment in enumerate(segments):
+            if segment.startswith('{') and segment.endswith('+}'):
+                if position != len(segments) - 1:
+                    raise ValueError(f"Route '{pattern}': '{segment}' must be the last segment.")
+                self._check_capture_name(pattern, segment[1:-2])
+                node.remainder_name = segment[1:-2]
+                node.remainder = handler
+                return
+
+            if segment.startswith('{') and segment.endswith('}'):
+                name = segment[1:-1]
+                self._check_capture_name(pattern, name)
+                if node.capture is None:
+                    node.capture = RouteNode()
+                    node.capture_name = name
+                elif node.capture_name != name:
+                    raise ValueError(
+                        f"Route '{pattern}': '{name}' conflicts with '{node.capture_name}'.")
+                node = node.capture
+                continue
+
+            node = node.literals.setdefault(segment, RouteNode())
+
+        node.handler = handler
+
+    @staticmethod
+    def _check_capture_name(pattern, name):
+        if name not in OscRequest.CAPTURES:
+            raise ValueError(f"Route '{pattern}': unknown capture '{name}'.")
+
+    def route(self, path, args, types, src):
+        '''Returns a tuple of the handler for the given message, and the request to pass to it.
+
+        If no route matches, the handler returned is `None`.
+        '''
+        captures = []
+        route = self._match(self._root, split_path(path), 0, captures)
+        request = OscRequest(path, args, types, src)
+        if route is None:
+            return None, request
+
+        for name, value in captures:
+            setattr(request, name, value)
+        handler, message_class = route
+        request.message_class = message_class if isinstance(message_class, MessageClass) \
+            else message_class(request)
+        return handler, request
+
+    def _match(self, node, segments, index, captures):
+        if index == len(segments):
+            return node.handler
+
+        segment = segments[index]
+
+        # Literal segments take precedence over captures
+        child = node.literals.get(segment)
+        if child is not None:
+            handler = self._match(child, segments, index + 1, captures)
+            if handler is not None:
+                return handler
+
+        if node.capture is not None:
+            captures.append((node.capture_name, segment))
+            handler = self._match(node.capture, segments, index + 1, captures)
+            if handler is not None:
+                return handler
+            captures.pop()
+
+        if node.remainder is not None:
+            captures.append((node.remainder_name, segments[index:]))
+            return node.remainder
+
+        return None
@@ -0,0 +1,205 @@
+# This file is a derivation of work on - and as such shares the same
+# licence as - Linux Show Player
+#
+# Linux Show Player:
+#   Copyright 2012-2022 Francesco Ceruti <ceppofrancy@gmail.com>
+#
+# This file:
+#   Copyright 2022 s0600204
+#
+# Linux Show Player is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Linux Show Player is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Incoming messages are handled in order of urgency, rather than strictly in the order received.
+
+A remote app used by a stage manager to GO should not have to wait whilst the server answers a
+burst of polls from other clients. Thus, once routed, each message is queued according to its
+`MessageClass`, and a dedicated thread handles them: transport commands first, then any changes,
+then read-only queries. Queries are handled in batches of limited size (a "tick"), between which
+the other queues are checked again.
+
+Urgency decides only between clients, though: each client's own messages are handled in the
+order that client sent them (so that, say, a query sent before a change is answered as it was
+then). Should the next message to be handled be preceded by others from the same client that are
+still queued, those are handled first.
+
+Queries are handled within the scheduler's thread. Other messages may instead be passed on to
+another thread to be handled (see `MainThreadDispatcher`), still in order of urgency.
+
+The time each message spends queued is recorded per class.
+"""
+
+from collections import deque
+import logging
+from threading import Condition, Thread
+from time import monotonic
+
+from .utility import client_id_string, MessageClass
+
+logger = logging.getLogger(__name__) # pylint: disable=invalid-name
+
+QUERY_BUDGET = 8 # queries per tick
+
+
+class LatencyStats:
+    '''Running statistics of a latency.'''
+
+    __slots__ = ('count', 'total', 'maximum')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.maximum = 0
+
+    def record(self, latency):
+        self.count += 1
+        self.total += latency
+        if latency > self.maximum:
+            self.maximum = latency
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count * 1000, 3) if self.count else 0,
+            'max_ms': round(self.maximum * 1000, 3),
+        }
+
+
+class QueuedMessage:
+
+    __slots__ = ('message_class', 'handler', 'request', 'client', 'queued_at', 'taken')
+
+    def __init__(self, message_class, handler, request, queued_at):
+        self.message_class = message_class
+        self.handler = handler
+        self.request = request
+        self.client = client_id_string(request.src)
+        self.queued_at = queued_at
+        # Set once handled, should it have been taken from the client's queue ahead of its turn
+        # in that of its class (where it remains, to be skipped)
+        self.taken = False
+
+
+class CommandScheduler:
+
+    def __init__(self, query_budget=QUERY_BUDGET, dispatcher=None):
+        self.query_budget = query_budget
+        self._dispatcher = dispatcher
+        self._queues = {message_class: deque() for message_class in MessageClass}
+        self._client_queues = {} # client id -> its queued messages, in the order received
+        self._latency = {message_class: LatencyStats() for message_class in MessageClass}
+        self._condition = Condition()
+        self._running = False
+        self._thread = None
+
+    @property
+    def stats(self):
+        return {
+            message_class.name.lower(): dict(
+                self._latency[message_class].as_dict(),
+                queued=sum(1 for queued in self._queues[message_class] if not queued.taken),
+            )
+            for message_class in MessageClass
+        }
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = Thread(target=self._run, name='QlabMimicScheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self._running:
+            return
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        self._thread.join()
+        self._thread = None
+        for queue in self._queues.values():
+            queue.clear()
+        self._client_queues.clear()
+
+    def submit(self, message_class, handler, request):
+        queued = QueuedMessage(message_class, handler, request, monotonic())
+        with self._condition:
+            self._queues[message_class].append(queued)
+            self._client_queues.setdefault(queued.client, deque()).append(queued)
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and not any(self._queues.values()):
+                    self._condition.wait()
+                if not self._running:
+                    return
+            self._tick()
+
+    def _tick(self):
+        # Transport commands and changes are handled as soon as they are received...
+        while self._handle_next(MessageClass.Transport) or self._handle_next(MessageClass.Set):
+            pass
+
+        # ...with queries handled in-between, a limited number at a time
+        urgent = (self._queues[MessageClass.Transport], self._queues[MessageClass.Set])
+        for _ in range(self.query_budget):
+            if any(urgent) or not self._handle_next(MessageClass.Query):
+                return
+
+    def _handle_next(self, message_class):
+        '''Handles the next message of the given class (or an earlier one from the same client),
+        returning `False` if there was none.
+        '''
+        queued = self._take_next(message_class)
+        if queued is None:
+            return False
+
+        request = queued.request
+        self._latency[queued.message_class].record(monotonic() - queued.queued_at)
+        if self._dispatcher is not None and (
+            queued.message_class is not MessageClass.Query
+            or self._dispatcher.has_pending(request.src)
+        ):
+            # (A query is passed on if the client's earlier messages are still waiting there, so
+            # that it's answered after them.)
+            self._dispatcher.submit(queued.handler, request)
+            return True
+
+        try:
+            queued.handler(request)
+        except Exception: # pylint: disable=broad-except
+            logger.exception(f"Error handling OSC message to '{request.path}'.")
+        return True
+
+    def _take_next(self, message_class):
+        with self._condition:
+            queue = self._queues[message_class]
+            while queue and queue[0].taken:
+                queue.popleft()
+            if not queue:
+                return None
+
+            # The client's earliest queued message, which may be of a less urgent class
+            client_queue = self._client_queues[queue[0].client]
+            queued = client_queue.popleft()
+            if not client_queue:
+                del self._client_queues[queued.client]
+            if queued is queue[0]:
+                queue.popleft()
+            else:
+                queued.taken = True
+            return queued
@@ -25,8 +25,10 @@
 # pylint: disable=no-name-in-module
 from PyQt5.QtWidgets import (
     QCheckBox,
+    QComboBox,
     QFormLayout,
     QGroupBox,
+    QSpinBox,
     QVBoxLayout,
 )
 
@@ -48,10 +50,116 @@ class QlabMimicSettings(SettingsPage):
         self._service_announcement = QCheckBox()
         self.settingsGroup.layout().addRow('Enable Service Announcement:', self._service_announcement)
 
+        self._osc_transport = QComboBox()
+        self._osc_transport.addItem('liblo', 'liblo')
+        self._osc_transport.addItem('asyncio (no liblo required)', 'asyncio')
+        self.settingsGroup.layout().addRow('OSC Transport:', self._osc_transport)
+
+        self._update_coalesce_window = QSpinBox()
+        self._update_coalesce_window.setRange(0, 500)
+        self._update_coalesce_window.setSuffix(' ms')
+        self._update_coalesce_window.setToolTip(
+            'Repeated updates about the same cue, sent within this window, are merged into one.')
+        self.settingsGroup.layout().addRow('Update Coalescing Window:', self._update_coalesce_window)
+
+        self._client_backlog_limit = QSpinBox()
+        self._client_backlog_limit.setRange(16, 4096)
+        self._client_backlog_limit.setSuffix(' messages')
+        self._client_backlog_limit.setToolTip(
+            'Clients with more than this many messages waiting to be sent to them are disconnected.')
+        self.settingsGroup.layout().addRow('Client Backlog Limit:', self._client_backlog_limit)
+
+        self._duplicate_message_window = QSpinBox()
+        self._duplicate_message_window.setRange(0, 1000)
+        self._duplicate_message_window.setSuffix(' ms')
+        self._duplicate_message_window.setSpecialValueText('Disabled')
+        self._duplicate_message_window.setToolTip(
+            'Repeats of a message, sent by the same client within this window, are ignored.')
+        self.settingsGroup.layout().addRow('Duplicate Message Window:', self._duplicate_message_window)
+
+        self._elapsed_ticker_rate = QSpinBox()
+        self._elapsed_ticker_rate.setRange(0, 30)
+        self._elapsed_ticker_rate.setSuffix(' Hz')
+        self._elapsed_ticker_rate.setSpecialValueText('Disabled')
+        self._elapsed_ticker_rate.setToolTip(
+            'How often the elapsed times of running cues are sampled and sent to subscribed clients.')
+        self.settingsGroup.layout().addRow('Elapsed Time Sampling:', self._elapsed_ticker_rate)
+
+        self._client_idle_timeout = QSpinBox()
+        self._client_idle_timeout.setRange(0, 3600)
+        self._client_idle_timeout.setSuffix(' s')
+        self._client_idle_timeout.setSpecialValueText('Never')
+        self._client_idle_timeout.setToolTip(
+            'Clients not heard from within this time are presumed gone, and are no longer sent updates.')
+        self.settingsGroup.layout().addRow('Client Idle Timeout:', self._client_idle_timeout)
+
+        self._max_clients = QSpinBox()
+        self._max_clients.setRange(0, 256)
+        self._max_clients.setSpecialValueText('Unlimited')
+        self._max_clients.setToolTip(
+            'Further clients attempting to connect, once this many are connected, are refused.')
+        self.settingsGroup.layout().addRow('Maximum Clients:', self._max_clients)
+
+        self._reply_cache_ttl = QSpinBox()
+        self._reply_cache_ttl.setRange(0, 1000)
+        self._reply_cache_ttl.setSuffix(' ms')
+        self._reply_cache_ttl.setSpecialValueText('Disabled')
+        self._reply_cache_ttl.setToolTip(
+            'Identical queries from different clients, received within this time, share the one reply.')
+        self.settingsGroup.layout().addRow('Reply Sharing Window:', self._reply_cache_ttl)
+
+        self.rateLimitGroup = QGroupBox(self)
+        self.rateLimitGroup.setTitle("Rate Limits (per client)")
+        self.rateLimitGroup.setLayout(QFormLayout())
+        self.layout().addWidget(self.rateLimitGroup)
+
+        self._rate_limits = {}
+        for key, label, tooltip in (
+            ('transport', 'Transport:', 'Go, stop, pause, resume, panic, and starting or stopping individual cues.'),
+            ('set', 'Changes:', 'Changes to the workspace, its cues, or the client\'s own settings.'),
+            ('query', 'Queries:', 'Requests for information about the workspace or its cues.'),
+        ):
+            spin_box = QSpinBox()
+            spin_box.setRange(0, 1000)
+            spin_box.setSuffix(' messages/s')
+            spin_box.setSpecialValueText('Unlimited')
+            spin_box.setToolTip(tooltip)
+            self.rateLimitGroup.layout().addRow(label, spin_box)
+            self._rate_limits[key] = spin_box
+
+        self._rate_limit_reply = QCheckBox()
+        self._rate_limit_reply.setToolTip(
+            'Messages sent too fast are replied to with an error. If unchecked, they are silently ignored.')
+        self.rateLimitGroup.layout().addRow('Reply When Limited:', self._rate_limit_reply)
+
     def getSettings(self):
         return {
             'service_announcement': self._service_announcement.isChecked(),
+            'osc_transport': self._osc_transport.currentData(),
+            'update_coalesce_window': self._update_coalesce_window.value(),
+            'client_backlog_limit': self._client_backlog_limit.value(),
+            'duplicate_message_window': self._duplicate_message_window.value(),
+            'elapsed_ticker_rate': self._elapsed_ticker_rate.value(),
+            'client_idle_timeout': self._client_idle_timeout.value(),
+            'max_clients': self._max_clients.value(),
+            'reply_cache_ttl': self._reply_cache_ttl.value(),
+            'rate_limit_transport': self._rate_limits['transport'].value(),
+            'rate_limit_set': self._rate_limits['set'].value(),
+            'rate_limit_query': self._rate_limits['query'].value(),
+            'rate_limit_reply': self._rate_limit_reply.isChecked(),
         }
 
     def loadSettings(self, settings):
         self._service_announcement.setChecked(settings['service_announcement'])
+        self._osc_transport.setCurrentIndex(
+            max(self._osc_transport.findData(settings.get('osc_transport', 'liblo')), 0))
+        self._update_coalesce_window.setValue(settings.get('update_coalesce_window', 30))
+        self._client_backlog_limit.setValue(settings.get('client_backlog_limit', 256))
+        self._duplicate_message_window.setValue(settings['duplicate_message_window'])
+        self._elapsed_ticker_rate.setValue(settings.get('elapsed_ticker_rate', 0))
+        self._client_idle_timeout.setValue(settings['client_idle_timeout'])
+        self._max_clients.setValue(settings['max_clients'])
+        self._reply_cache_ttl.setValue(settings['reply_cache_ttl'])
+        for key, spin_box in self._rate_limits.items():
+            spin_box.setValue(settings[f'rate_limit_{key}'])
+        self._rate_limit_reply.setChecked(settings['rate_limit_reply'])
@@ -0,0 +1,165 @@
+# This file is a derivation of work on - and as such shares the same
+# licence as - Linux Show Player
+#
+# Linux Show Player:
+#   Copyright 2012-2022 Francesco Ceruti <ceppofrancy@gmail.com>
+#
+# This file:
+#   Copyright 2022 s0600204
+#
+# Linux Show Player is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Linux Show Player is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+An immutable snapshot of those fields of each cue that remote apps see, so that requests about
+cues may be answered (from any thread) without reading the cues themselves.
+
+Alongside a read-only mapping of cue ids to `CueRecord`s, the snapshot holds the order of the cue
+lists, the ids of the cues within each (in order), and the number of every cue. A cue's number is
+held apart from its record, as (in List Layout) moving one cue changes the number of many others
+without any of them signalling so.
+
+The snapshot is never modified once published: a change to a cue produces a new record for that
+cue, and a new snapshot that shares all else with the last, which then replaces it as the current
+snapshot. Readers thus need only take the current snapshot, and may continue to use it without
+locking.
+"""
+
+from types import MappingProxyType
+
+from .json_writer import encode_json, extend_fragment, join_fragments, JsonFragment
+
+
+class CueRecord:
+    '''The fields of a cue, as seen by remote apps, at a moment in time.'''
+
+    __slots__ = (
+        'id', 'name', 'notes', 'qlab_type', 'colour', 'duration', 'pre_wait', 'post_wait',
+        'continue_mode', 'cart_rows', 'cart_columns', 'summary', '_summary_json',
+    )
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, cue_id, name, notes, qlab_type, colour, duration, pre_wait, post_wait,
+                 continue_mode, cart_rows=None, cart_columns=None):
+        summary = MappingProxyType({
+            'uniqueID': cue_id, # string
+            'name': name, # string
+            'listName': name, # string
+            'type': qlab_type, # string
+            'colorName': colour, # string
+            'flagged': 'false', # number when setting, string when returning
+            'armed': 'true', # number when setting, string when returning
+        })
+        values = (
+            cue_id, name, notes, qlab_type, colour, duration, pre_wait, post_wait, continue_mode,
+            cart_rows, cart_columns,
+            summary,
+            # Everything after the opening brace, so that the number may be inserted before it
+            encode_json(dict(summary))[1:],
+        )
+        for slot, value in zip(self.__slots__, values):
+            object.__setattr__(self, slot, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"'{type(self).__name__}' is immutable.")
+
+    def summary_with_number(self, number):
+        '''Returns the summary (as sent to remote apps) of the cue, given its current number.'''
+        summary = dict(self.summary)
+        summary['number'] = number # string
+        return summary
+
+    def summary_json_with_number(self, number):
+        '''As `summary_with_number`, but pre-encoded as JSON.'''
+        return JsonFragment('{"number":' + encode_json(number) + ',' + self._summary_json)
+
+
+class Snapshot:
+    '''The records of all cues, and the cues within each cue list, at a moment in time.'''
+
+    __slots__ = ('records', 'cuelists', 'children', 'numbers')
+
+    def __init__(self, records, cuelists=(), children=None, numbers=None):
+        values = (
+            MappingProxyType(records),
+            # The ids of the cue lists, in order
+            tuple(cuelists),
+            # The ids of the cues within each cue list, in order
+            MappingProxyType(children or {}),
+            # The number of each cue (and cue list)
+            MappingProxyType(numbers or {}),
+        )
+        for slot, value in zip(self.__slots__, values):
+            object.__setattr__(self, slot, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"'{type(self).__name__}' is immutable.")
+
+    def get(self, cue_id):
+        return self.records.get(cue_id)
+
+    def summary(self, cue_id, deep=False):
+        '''Returns the summary of a cue, or `None` if it's not in the snapshot.
+
+        If `deep`, the summary of a cue list includes those of the cues within it.
+        '''
+        record = self.records.get(cue_id)
+        if record is None:
+            return None
+        summary = record.summary_with_number(self.numbers.get(cue_id))
+        if deep and cue_id in self.children:
+            summary['cues'] = self.summaries(self.children[cue_id], deep)
+        return summary
+
+    def summaries(self, cue_ids, deep=False):
+        '''Returns the summaries of those of the given cues that are in the snapshot.'''
+        summaries = (self.summary(cue_id, deep) for cue_id in cue_ids)
+        return [summary for summary in summaries if summary is not None]
+
+    def summary_json(self, cue_id, deep=False):
+        '''As `summary`, but pre-encoded as JSON.'''
+        record = self.records.get(cue_id)
+        if record is None:
+            return None
+        fragment = record.summary_json_with_number(self.numbers.get(cue_id))
+        if deep and cue_id in self.children:
+            fragment = extend_fragment(fragment, 'cues', join_fragments(
+                self.summaries_json(self.children[cue_id], deep)))
+        return fragment
+
+    def summaries_json(self, cue_ids, deep=False):
+        summaries = (self.summary_json(cue_id, deep) for cue_id in cue_ids)
+        return [summary for summary in summaries if summary is not None]
+
+
+EMPTY_SNAPSHOT = Snapshot({})
+
+
+def replace_records(snapshot, records=(), removed=(), structure=None):
+    '''Returns a new snapshot, with the given records added (or replaced) and ids removed.
+
+    If given, `structure` is a tuple of the cue list order, children, and numbers (as held by a
+    snapshot) that replace those of the snapshot.
+    '''
+    updated = dict(snapshot.records)
+    for record in records:
+        updated[record.id] = record
+    for cue_id in removed:
+        updated.pop(cue_id, None)
+    if structure is None:
+        structure = (snapshot.cuelists, snapshot.children, snapshot.numbers)
+    return Snapshot(updated, *structure)
+
+def new_snapshot(records, structure):
+    return Snapshot({record.id: record for record in records}, *structure)
@@ -0,0 +1,42 @@
+# This file is a derivation of work on - and as such shares the same
+# licence as - Linux Show Player
+#
+# Linux Show Player:
+#   Copyright 2012-2022 Francesco Ceruti <ceppofrancy@gmail.com>
+#
+# This file:
+#   Copyright 2022 s0600204
+#
+# Linux Show Player is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Linux Show Player is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from qlab_mimic.change_journal import ChangeJournal, CUE_ADDED
+
+
+def test_horizon_follows_dropped_entries():
+    journal = ChangeJournal(lambda cuelist_ids, overflowed: None, limit=4)
+    for generation in range(1, 5):
+        journal.record(generation, CUE_ADDED, 'cue{}'.format(generation), 'list')
+    assert journal.horizon == 0
+    assert journal.retains(0)
+
+    journal.record(5, CUE_ADDED, 'cue5', 'list')
+    journal.record(6, CUE_ADDED, 'cue6', 'list')
+    assert journal.horizon == 2
+    assert not journal.retains(1)
+    assert journal.retains(2)
+    assert [entry[0] for entry in journal.since(2)] == [3, 4, 5, 6]
+
+    journal.clear()
+    assert journal.horizon == 0
@@ -0,0 +1,62 @@
+# This file is a derivation of work on - and as such shares the same
+# licence as - Linux Show Player
+#
+# Linux Show Player:
+#   Copyright 2012-2022 Francesco Ceruti <ceppofrancy@gmail.com>
+#
+# This file:
+#   Copyright 2022 s0600204
+#
+# Linux Show Player is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Linux Show Player is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import random
+import re
+
+from qlab_mimic.colour import find_nearest_colour, qlab_colour_from_stylesheet
+
+CACHE_SIZE = qlab_colour_from_stylesheet.cache_info().maxsize
+
+
+def uncached_qlab_colour(stylesheet):
+    '''The mapping as it was performed before it was cached.'''
+    colour = re.search(r'background:#([0-9A-Fa-f]{6});', stylesheet)
+    if not colour:
+        return 'none'
+    colour = colour.group(1)
+    return find_nearest_colour((
+        int(colour[0:2], 16),
+        int(colour[2:4], 16),
+        int(colour[4:6], 16)
+    ))[1]
+
+
+def test_cached_matches_uncached():
+    generator = random.Random(53000)
+    stylesheets = ['', 'color:#ffffff;', 'background:#fff;', 'background: #123456;']
+    stylesheets += [
+        'background:#{:06x};color:#000000;'.format(generator.randrange(0x1000000))
+        for _ in range(CACHE_SIZE - len(stylesheets))
+    ]
+    qlab_colour_from_stylesheet.cache_clear()
+    # Each twice: no more than fit in the cache, so that the second is answered from it
+    for stylesheet in stylesheets + stylesheets:
+        assert qlab_colour_from_stylesheet(stylesheet) == uncached_qlab_colour(stylesheet)
+    assert qlab_colour_from_stylesheet.cache_info().hits == len(set(stylesheets))
+
+
+def test_palette_colours_map_to_themselves():
+    assert qlab_colour_from_stylesheet('background:#fd363b;') == 'red'
+    assert qlab_colour_from_stylesheet('background:#415ADA;') == 'blue'
+    assert qlab_colour_from_stylesheet('') == 'none'
@@ -0,0 +1,88 @@
+# This file is a derivation of work on - and as such shares the same
+# licence as - Linux Show Player
+#
+# Linux Show Player:
+#   Copyright 2012-2022 Francesco Ceruti <ceppofrancy@gmail.com>
+#
+# This file:
+#   Copyright 2022 s0600204
+#
+# Linux Show Player is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Linux Show Player is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import tracemalloc
+
+from qlab_mimic import duplicate_filter
+from qlab_mimic.duplicate_filter import DuplicateFilter, DUPLICATE_FILTER_CAPACITY
+
+SOAK_MESSAGES = 200000
+SOAK_SAMPLE_EVERY = 20000
+SOAK_MESSAGE_INTERVAL = 0.00001 # seconds
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_interleaved_repeats_are_caught(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(duplicate_filter, 'monotonic', clock)
+    dup_filter = DuplicateFilter(0.1)
+
+    assert not dup_filter.is_duplicate('client', '/a')
+    assert not dup_filter.is_duplicate('client', '/b')
+    assert dup_filter.is_duplicate('client', '/a')
+    assert not dup_filter.is_duplicate('other', '/a')
+
+    clock.now += 0.2
+    assert not dup_filter.is_duplicate('client', '/a')
+    assert dup_filter.stats['hits'] == 1
+
+
+def test_disabled_when_window_is_zero():
+    dup_filter = DuplicateFilter(0)
+    assert not dup_filter.is_duplicate('client', '/go')
+    assert not dup_filter.is_duplicate('client', '/go')
+    assert len(dup_filter) == 0
+
+
+def test_memory_is_constant_with_rotating_clients(monkeypatch):
+    '''A flood of messages from clients reconnecting from ever-changing ports.'''
+    clock = FakeClock()
+    monkeypatch.setattr(duplicate_filter, 'monotonic', clock)
+    dup_filter = DuplicateFilter(0.1)
+    paths = ['/workspace/x/cue_id/{}/name'.format(index) for index in range(50)] + ['/go', '/thump']
+
+    tracemalloc.start()
+    try:
+        samples = []
+        for index in range(SOAK_MESSAGES):
+            client = 'osc.tcp://10.0.0.{}:{}/'.format(index % 12, 40000 + (index // 500) % 20000)
+            dup_filter.is_duplicate(client, paths[index % len(paths)])
+            clock.now += SOAK_MESSAGE_INTERVAL
+            if index % SOAK_SAMPLE_EVERY == SOAK_SAMPLE_EVERY - 1:
+                samples.append((len(dup_filter), tracemalloc.get_traced_memory()[0]))
+    finally:
+        tracemalloc.stop()
+
+    assert all(entries <= DUPLICATE_FILTER_CAPACITY for entries, _ in samples)
+    # Once the table is full, memory use doesn't grow, however many clients have been seen
+    baseline = samples[0][1]
+    assert all(memory <= baseline * 1.1 for _, memory in samples[1:])
+    assert dup_filter.stats['evicted'] + dup_filter.stats['expired'] > 0
@@ -0,0 +1,74 @@
+# This file is a derivation of work on - and as such shares the same
+# licence as - Linux Show Player
+#
+# Linux Show Player:
+#   Copyright 2012-2022 Francesco Ceruti <ceppofrancy@gmail.com>
+#
+# This file:
+#   Copyright 2022 s0600204
+#
+# Linux Show Player is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Linux Show Player is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+import struct
+
+import pytest
+
+from qlab_mimic.osc_codec import (
+    BUNDLE_TAG, decode_packet, encode_message, MAX_BUNDLE_DEPTH)
+
+
+def bundle(*elements):
+    packet = BUNDLE_TAG + b'\x00' * 8
+    for element in elements:
+        packet += struct.pack('>i', len(element)) + element
+    return packet
+
+def nested(message, depth):
+    for _ in range(depth):
+        message = bundle(message)
+    return message
+
+
+def test_bundles_are_flattened_in_order():
+    packet = bundle(encode_message('/a', 1), bundle(encode_message('/b', 'x')), encode_message('/c'))
+    assert [path for path, _, _ in decode_packet(packet)] == ['/a', '/b', '/c']
+
+
+@pytest.mark.parametrize('length', range(1, len(encode_message('/go', 1))))
+def test_truncated_messages_are_refused(length):
+    packet = encode_message('/go', 1)[:length]
+    with pytest.raises(ValueError):
+        decode_packet(packet)
+
+
+@pytest.mark.parametrize('packet', [
+    bundle(encode_message('/go'))[:-3],
+    BUNDLE_TAG + b'\x00' * 8 + struct.pack('>i', -4),
+    BUNDLE_TAG + b'\x00' * 8 + b'\x00\x00',
+])
+def test_malformed_bundles_are_refused(packet):
+    with pytest.raises(ValueError):
+        decode_packet(packet)
+
+
+def test_deeply_nested_bundles_are_refused():
+    message = encode_message('/go')
+    assert decode_packet(nested(message, MAX_BUNDLE_DEPTH)) == [('/go', [], '')]
+    with pytest.raises(ValueError):
+        decode_packet(nested(message, MAX_BUNDLE_DEPTH + 1))
+    # Deep enough to have exhausted the stack, were bundles read recursively
+    with pytest.raises(ValueError):
+        decode_packet(nested(message, 5000))
@@ -0,0 +1,70 @@
+# This file is a derivation of work on - and as such shares the same
+# licence as - Linux Show Player
+#
+# Linux Show Player:
+#   Copyright 2012-2022 Francesco Ceruti <ceppofrancy@gmail.com>
+#
+# This file:
+#   Copyright 2022 s0600204
+#
+# Linux Show Player is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Linux Show Player is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+from qlab_mimic import rate_limiter
+from qlab_mimic.rate_limiter import ANONYMOUS_BUCKETS_TTL, RateLimiter
+from qlab_mimic.utility import MessageClass
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_unlimited_by_default():
+    limiter = RateLimiter()
+    assert all(limiter.allow('client', None, MessageClass.Transport) for _ in range(1000))
+
+
+def test_unconnected_clients_have_their_own_buckets(monkeypatch):
+    monkeypatch.setattr(rate_limiter, 'monotonic', FakeClock())
+    limiter = RateLimiter()
+    limiter.set_rate(MessageClass.Transport, 2)
+
+    assert limiter.allow('noisy', None, MessageClass.Transport)
+    assert limiter.allow('noisy', None, MessageClass.Transport)
+    assert not limiter.allow('noisy', None, MessageClass.Transport)
+    # Another client is unaffected by the first having used up its bucket
+    assert limiter.allow('quiet', None, MessageClass.Transport)
+
+
+def test_unconnected_buckets_are_bounded(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, 'monotonic', clock)
+    limiter = RateLimiter(capacity=8)
+    limiter.set_rate(MessageClass.Query, 10)
+
+    for port in range(100):
+        limiter.allow('osc.tcp://10.0.0.1:{}/'.format(40000 + port), None, MessageClass.Query)
+    assert limiter.stats['anonymous']['entries'] == 8
+    assert limiter.evicted == 92
+
+    clock.now += ANONYMOUS_BUCKETS_TTL + 0.1
+    limiter.allow('osc.tcp://10.0.0.2:40000/', None, MessageClass.Query)
+    assert limiter.stats['anonymous']['entries'] == 1
+    assert limiter.expired == 8
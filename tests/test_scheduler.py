@@ -0,0 +1,68 @@
+# This file is a derivation of work on - and as such shares the same
+# licence as - Linux Show Player
+#
+# Linux Show Player:
+#   Copyright 2012-2022 Francesco Ceruti <ceppofrancy@gmail.com>
+#
+# This file:
+#   Copyright 2022 s0600204
+#
+# Linux Show Player is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Linux Show Player is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+from types import SimpleNamespace
+
+from qlab_mimic.scheduler import CommandScheduler
+from qlab_mimic.utility import MessageClass
+
+
+def client(port):
+    return SimpleNamespace(hostname='10.0.0.1', port=port)
+
+
+def queue_messages(scheduler, messages):
+    handled = []
+    for src, message_class, name in messages:
+        request = SimpleNamespace(src=src, path=name, message_class=message_class)
+        scheduler.submit(message_class, lambda request: handled.append(request.path), request)
+    return handled
+
+
+def test_urgent_messages_overtake_other_clients():
+    scheduler = CommandScheduler()
+    handled = queue_messages(scheduler, [
+        (client(1), MessageClass.Query, 'a: query'),
+        (client(2), MessageClass.Query, 'b: query'),
+        (client(3), MessageClass.Transport, 'c: go'),
+    ])
+    scheduler._tick()
+    assert handled == ['c: go', 'a: query', 'b: query']
+
+
+def test_each_clients_messages_are_handled_in_order():
+    scheduler = CommandScheduler()
+    handled = queue_messages(scheduler, [
+        (client(1), MessageClass.Query, 'a: query name'),
+        (client(2), MessageClass.Query, 'b: query'),
+        (client(1), MessageClass.Set, 'a: set name'),
+        (client(1), MessageClass.Query, 'a: query name again'),
+        (client(3), MessageClass.Transport, 'c: go'),
+    ])
+    scheduler._tick()
+    # The query sent before the change is answered before it, yet still after another's GO
+    assert handled == [
+        'c: go', 'a: query name', 'a: set name', 'b: query', 'a: query name again']
+    assert scheduler.stats['query']['queued'] == 0
+    assert not scheduler._client_queues
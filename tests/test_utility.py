@@ -0,0 +1,46 @@
+# This file is a derivation of work on - and as such shares the same
+# licence as - Linux Show Player
+#
+# Linux Show Player:
+#   Copyright 2012-2022 Francesco Ceruti <ceppofrancy@gmail.com>
+#
+# This file:
+#   Copyright 2022 s0600204
+#
+# Linux Show Player is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Linux Show Player is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+import pytest
+
+from qlab_mimic.utility import compile_osc_pattern
+
+
+@pytest.mark.parametrize('pattern, matches, mismatches', [
+    ('1*', ['1', '10', '123'], ['2', '21']),
+    ('1?', ['10', '19'], ['1', '100']),
+    ('[1-3]', ['1', '2', '3'], ['4', '0']),
+    ('[!1-3]', ['4', '0'], ['1', '3']),
+    ('{1,12}', ['1', '12'], ['2', '121']),
+])
+def test_patterns_match(pattern, matches, mismatches):
+    regex = compile_osc_pattern(pattern)
+    assert all(regex.fullmatch(value) for value in matches)
+    assert not any(regex.fullmatch(value) for value in mismatches)
+
+
+@pytest.mark.parametrize('pattern', ['1[]', '1[!]', '[z-a]', '[9-1]'])
+def test_malformed_patterns_are_refused(pattern):
+    with pytest.raises(ValueError):
+        compile_osc_pattern(pattern)
@@ -0,0 +1,93 @@
+# This file is a derivation of work on - and as such shares the same
+# licence as - Linux Show Player
+#
+# Linux Show Player:
+#   Copyright 2012-2022 Francesco Ceruti <ceppofrancy@gmail.com>
+#
+# This file:
+#   Copyright 2022 s0600204
+#
+# Linux Show Player is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Linux Show Player is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Whenever a cue changes state, it emits a signal. Starting a single cue may cause several of these
+signals to be emitted in quick succession (e.g. `prewait_start`, `prewait_ended`, `started`), and
+each one would normally result in an identical `/update/workspace/<id>/cue_id/<cue_id>` message
+being sent to every client. Each of those messages in turn prompts a client to re-request
+information about the cue.
+
+To reduce this, updates are held for a short window of time. Any further updates to the same path
+within that window are merged into the one already waiting, and when the window expires all held
+updates are sent.
+"""
+
+import logging
+from threading import Lock, Timer
+
+logger = logging.getLogger(__name__) # pylint: disable=invalid-name
+
+
+class UpdateCoalescer:
+
+    def __init__(self, send, window=0):
+        self._send = send
+        self._window = window # seconds
+        self._lock = Lock()
+        self._pending = {}
+        self._timer = None
+
+    @property
+    def window(self):
+        return self._window
+
+    @window.setter
+    def window(self, window):
+        self._window = max(window, 0)
+        if not self._window:
+            self.flush()
+
+    def push(self, path, args=()):
+        if not self._window:
+            self._send(list(path), list(args))
+            return
+
+        with self._lock:
+            # If an update is already pending for this path, the more recent arguments are kept.
+            self._pending[tuple(path)] = args
+            if self._timer is None:
+                self._timer = Timer(self._window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            pending = self._pending
+            self._pending = {}
+
+        for path, args in pending.items():
+            try:
+                self._send(list(path), list(args))
+            except Exception: # pylint: disable=broad-except
+                logger.exception(f"Unable to send update to '{'/'.join(path)}'.")
+
+    def cancel(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._pending = {}
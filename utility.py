@@ -21,11 +21,21 @@
 # along with Linux Show Player.  If not, see <http://www.gnu.org/licenses/>.
 
 from enum import Enum
+from functools import lru_cache
+import re
+
+CLIENT_BACKLOG_LIMIT = 256 # messages
 
 class QlabStatus(Enum):
     Ok = 'ok'
     NotOk = 'error'
 
+class MessageClass(Enum):
+    '''How urgently an incoming message should be handled; the most urgent first.'''
+    Transport = 0 # GO, stop, panic, etc.
+    Set = 1 # Changes to the workspace, cues, or the client's own settings
+    Query = 2 # Read-only
+
 def client_id_string(src):
     return '{}:{}'.format(src.hostname, src.port)
 
@@ -38,3 +48,66 @@ def join_path(path):
     path = list(path)
     path[0:0] = [""]
     return "/".join(path)
+
+OSC_PATTERN_CHARS = '*?[{'
+
+def has_osc_pattern(segment):
+    return any(char in segment for char in OSC_PATTERN_CHARS)
+
+def osc_pattern_prefixes(pattern):
+    '''Returns the literal strings that anything matching an OSC address pattern must begin with.
+
+    Alternatives (`{a,b}`) directly following the literal part of the pattern are expanded.
+    '''
+    end = 0
+    while end < len(pattern) and pattern[end] not in OSC_PATTERN_CHARS:
+        end += 1
+    prefix = pattern[:end]
+
+    if end < len(pattern) and pattern[end] == '{' and '}' in pattern[end:]:
+        prefixes = []
+        for alternative in pattern[end + 1:pattern.index('}', end)].split(','):
+            prefixes.extend(prefix + sub for sub in osc_pattern_prefixes(alternative))
+        return prefixes
+
+    return [prefix]
+
+@lru_cache(maxsize=64)
+def compile_osc_pattern(pattern):
+    '''Converts an OSC address pattern (of a single path segment) to a compiled regex.
+
+    Raises `ValueError` should the pattern be malformed (e.g. an empty or reversed range: `[]`,
+    `[z-a]`).
+    '''
+    regex = []
+    pos = 0
+    while pos < len(pattern):
+        char = pattern[pos]
+        if char == '*':
+            regex.append('.*')
+        elif char == '?':
+            regex.append('.')
+        elif char == '[' and ']' in pattern[pos:]:
+            end = pattern.index(']', pos)
+            chars = pattern[pos + 1:end]
+            negate = chars.startswith('!')
+            if negate:
+                chars = chars[1:]
+            chars = ''.join(
+                '-' if c == '-' and 0 < i < len(chars) - 1 else re.escape(c)
+                for i, c in enumerate(chars)
+            )
+            regex.append(f"[{'^' if negate else ''}{chars}]")
+            pos = end
+        elif char == '{' and '}' in pattern[pos:]:
+            end = pattern.index('}', pos)
+            alternatives = pattern[pos + 1:end].split(',')
+            regex.append('(?:' + '|'.join(re.escape(a) for a in alternatives) + ')')
+            pos = end
+        else:
+            regex.append(re.escape(char))
+        pos += 1
+    try:
+        return re.compile(''.join(regex))
+    except re.error:
+        raise ValueError(f"Malformed OSC address pattern '{pattern}'.") from None